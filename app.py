@@ -1,6 +1,26 @@
-from flask import Flask, send_from_directory, render_template
+import os
+from flask import Flask, send_from_directory, render_template, request, abort, jsonify
+from werkzeug.security import safe_join
+from src.delivery import content_etag, choose_variant, viewer_filename
+from src.results import ResultStore, InvalidCursor, DEFAULT_PAGE_SIZE
 # Initialize the Flask application
 app = Flask(__name__, static_folder='frontend')
+result_store = ResultStore()
+
+def send_verified(directory, filename, mimetype=None):
+    """
+    Sends a file with a strong content-hash ETag. Conditional requests get 304s,
+    and Range requests are honoured; with If-Range they are only served as a
+    range when the ETag still matches, so a client never stitches together
+    bytes from two versions of the file.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    response = send_from_directory(directory, filename, etag=content_etag(path), mimetype=mimetype)
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/')
 def serve_index():
@@ -20,15 +40,57 @@ def serve_static(filename):
 def get_json(filename):
     """
     Provides an API endpoint to get a JSON analysis file from the 'output' directory.
+    Serves the brotli or gzip copy written alongside it when the client accepts one.
     """
-    return send_from_directory('output', filename)
+    path = safe_join('output', filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    variant, encoding = choose_variant(path, request.accept_encodings)
+    if encoding is None:
+        response = send_verified('output', filename)
+    else:
+        response = send_verified('output', os.path.relpath(variant, 'output'),
+                                 mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/api/results/<path:filename>/sections')
+def get_sections(filename):
+    """
+    Returns one page of the ranked sections of an analysis file in 'output'.
+    Page with `offset` and `limit`, or follow the `next_cursor` of the previous
+    page with `cursor`.
+    """
+    path = safe_join('output', filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    try:
+        page = result_store.page(path,
+                                 offset=request.args.get('offset', 0, type=int),
+                                 limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                                 cursor=request.args.get('cursor'))
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError:
+        return jsonify({"error": f"'{filename}' is not a valid analysis file."}), 400
+    response = jsonify(page)
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/input/<path:filename>')
 def get_pdf(filename):
     """
     Provides an API endpoint to get a PDF document from the 'input' directory.
+    Supports byte-range requests so the viewer can fetch pages on demand, and
+    sends the optimized copy written by src/ingest.py when there is one.
     """
-    return send_from_directory('input', filename)
+    path = safe_join('input', filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return send_verified('input', viewer_filename('input', filename))
 
 if __name__ == '__main__':
     # Run the Flask app on the local development server
@@ -34,10 +34,17 @@ document.addEventListener("DOMContentLoaded", () => {
 
     let adobeDCView;
 
-    async function fetchAnalysisData(jsonFile) {
+    // Sections requested per page; the server caps this at 100.
+    const PAGE_SIZE = 20;
+
+    async function fetchAnalysisData(jsonFile, cursor) {
+        // Fetches one page of ranked sections rather than the whole analysis file.
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (cursor) params.set("cursor", cursor);
         try {
-            const response = await fetch(`/output/${jsonFile}`);
-            if (!response.ok) throw new Error(`File not found in /output/ folder: ${jsonFile}`);
+            const response = await fetch(`/api/results/${jsonFile}/sections?${params}`);
+            if (response.status === 404) throw new Error(`File not found in /output/ folder: ${jsonFile}`);
+            if (!response.ok) throw new Error((await response.json()).error || `Request failed (${response.status})`);
             return await response.json();
         } catch (error) {
             console.error("Failed to fetch analysis data:", error);
@@ -69,24 +76,33 @@ document.addEventListener("DOMContentLoaded", () => {
             embedMode: "SIZED_CONTAINER",
             showPrintPDF: true,
             showDownloadPDF: true,
+            // /input/ serves byte ranges, so the viewer can render the first
+            // page before the whole PDF has been downloaded.
+            enableLinearization: true,
         });
     }
 
-    function populateSidebar(data) {
+    function populateSidebar(page) {
         const toc = document.getElementById("smart-toc");
         const personaInfo = document.getElementById("persona-info");
         const jobInfo = document.getElementById("job-info");
 
-        if (!data?.metadata || !Array.isArray(data?.extracted_sections)) {
+        if (!page?.metadata || !Array.isArray(page?.sections)) {
             toc.innerHTML = `<div class="loader">Invalid data format in JSON file.</div>`;
             return;
         }
 
-        personaInfo.textContent = `Persona: ${data.metadata.persona}`;
-        jobInfo.textContent = `Job: ${data.metadata.job_to_be_done}`;
+        personaInfo.textContent = `Persona: ${page.metadata.persona}`;
+        jobInfo.textContent = `Job: ${page.metadata.job_to_be_done}`;
         toc.innerHTML = ""; // Clear loader
+        appendSections(page);
+    }
+
+    function appendSections(page) {
+        const toc = document.getElementById("smart-toc");
+        toc.querySelector(".load-more")?.remove();
 
-        data.extracted_sections.forEach(item => {
+        page.sections.forEach(item => {
             const tocItem = document.createElement("div");
             tocItem.className = "toc-item";
             tocItem.innerHTML = `
@@ -109,6 +125,18 @@ document.addEventListener("DOMContentLoaded", () => {
             });
             toc.appendChild(tocItem);
         });
+
+        if (page.next_cursor) {
+            const loadMore = document.createElement("button");
+            loadMore.className = "load-more";
+            loadMore.textContent = `Load more (${page.offset + page.sections.length} of ${page.total})`;
+            loadMore.addEventListener("click", async () => {
+                loadMore.disabled = true;
+                const nextPage = await fetchAnalysisData(analysisFile, page.next_cursor);
+                if (nextPage) appendSections(nextPage);
+            });
+            toc.appendChild(loadMore);
+        }
     }
 
     async function main() {
@@ -121,7 +149,7 @@ document.addEventListener("DOMContentLoaded", () => {
         }
         console.log("Analysis data fetched successfully.");
 
-        const extractedSections = analysisData.extracted_sections;
+        const extractedSections = analysisData.sections;
         if (!Array.isArray(extractedSections) || extractedSections.length === 0) {
             console.error("No extracted_sections found in analysis data or it is empty.");
             document.getElementById("smart-toc").innerHTML = `<div class="loader">No relevant sections found in analysis.</div>`;
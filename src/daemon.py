@@ -0,0 +1,179 @@
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+
+def _default_socket_path():
+    # A per-user directory nobody else can write to: $XDG_RUNTIME_DIR when the
+    # session has one, else a 0700 directory of our own under the temp dir.
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'pdf-intelligence.sock')
+    return os.path.join(tempfile.gettempdir(), f"pdf-intelligence-{uid}", 'daemon.sock')
+
+
+# Where the daemon listens, and where src/main.py looks for it.
+SOCKET_PATH = os.environ.get('PDF_DAEMON_SOCKET') or _default_socket_path()
+
+
+def _owned_socket(path):
+    """True if `path` is a socket owned by the current user, so its daemon is our own."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid()
+
+
+class _RemoteStream:
+    """A text stream that forwards everything written to it to the client, tagged with its name."""
+
+    encoding = 'utf-8'
+
+    def __init__(self, wfile, name):
+        self.wfile = wfile
+        self.name = name
+
+    def write(self, text):
+        if text:
+            self.wfile.write((json.dumps({self.name: text}) + "\n").encode('utf-8'))
+        return len(text)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def isatty(self):
+        return False
+
+
+def run_in_daemon(argv, prog, socket_path=SOCKET_PATH):
+    """
+    Runs src/main.py with `argv` in the daemon, if one is listening on
+    `socket_path`, copying its output to this process's stdout and stderr as
+    it is produced. The command runs with this process's working directory
+    and environment. Returns the exit code, or None when there is no daemon
+    (the caller then runs the command itself). A socket owned by another user
+    is never trusted.
+    """
+    if not hasattr(socket, 'AF_UNIX') or '--no-daemon' in argv:
+        return None
+    if not _owned_socket(socket_path):
+        if os.path.exists(socket_path):
+            print(f"Warning: Ignoring '{socket_path}', which is not a socket owned by this user.",
+                  file=sys.stderr)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    with sock, sock.makefile('rwb') as f:
+        request = {"argv": argv, "prog": prog, "cwd": os.getcwd(), "env": dict(os.environ)}
+        f.write((json.dumps(request) + "\n").encode('utf-8'))
+        f.flush()
+        for line in f:
+            message = json.loads(line)
+            if "exit" in message:
+                return message["exit"]
+            for name, text in message.items():
+                stream = sys.stdout if name == "stdout" else sys.stderr
+                stream.write(text)
+                stream.flush()
+    print("Error: The daemon closed the connection before the command finished.", file=sys.stderr)
+    return 1
+
+
+def serve(socket_path=SOCKET_PATH, model_path='src/heading_classifier.joblib'):
+    """
+    Listens on `socket_path` and runs src/main.py commands sent by
+    run_in_daemon. PyMuPDF, numpy and the heading classifier are loaded once,
+    up front. Each command runs in a forked child, which inherits them
+    already loaded, takes the client's working directory and environment (so
+    relative paths and settings mean the same as in-process) and streams the
+    command's output back. Commands therefore run concurrently and cannot
+    affect one another.
+    """
+    import socketserver
+    import traceback
+    import main
+    from pdf_extractor import load_model
+
+    try:
+        load_model(model_path)
+    except FileNotFoundError:
+        print(f"Warning: Model file not found at '{model_path}'; each command will load its own.")
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline())
+            sys.stdout = _RemoteStream(self.wfile, "stdout")
+            sys.stderr = _RemoteStream(self.wfile, "stderr")
+            code = 0
+            try:
+                os.chdir(request["cwd"])
+                os.environ.clear()
+                os.environ.update(request["env"])
+                sys.argv = [request["prog"]] + request["argv"]
+                main.main()
+            except SystemExit as e:
+                # Mirrors how the interpreter turns SystemExit into an exit status.
+                if isinstance(e.code, int) or e.code is None:
+                    code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    code = 1
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            self.wfile.write((json.dumps({"exit": code}) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+    class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+        pass
+
+    # The socket's directory is created private to this user.
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, mode=0o700)
+    if os.stat(socket_dir).st_uid != os.getuid():
+        raise SystemExit(f"'{socket_dir}' belongs to another user; choose another socket with --socket.")
+
+    # A socket file left behind by a daemon that died is removed; a live one is not.
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            raise SystemExit(f"A daemon is already listening on '{socket_path}'.")
+        except OSError:
+            os.remove(socket_path)
+        finally:
+            probe.close()
+
+    with Server(socket_path, Handler) as server:
+        os.chmod(socket_path, 0o600)
+        print(f"Daemon listening on '{socket_path}'. Press Ctrl+C to stop.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Keep the PDF tools loaded and run src/main.py commands sent over a Unix socket."
+    )
+    parser.add_argument("--socket", type=str, default=SOCKET_PATH, help=f"Socket path (default: {SOCKET_PATH}).")
+    parser.add_argument("--model", type=str, default='src/heading_classifier.joblib',
+                        help="Heading classifier to preload (default: src/heading_classifier.joblib).")
+    args = parser.parse_args()
+    serve(args.socket, args.model)
@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip variants are always written.
+    brotli = None
+
+# Precompressed variants stored next to each result file, best first.
+VARIANTS = [('br', '.br'), ('gzip', '.gz')]
+# Optimized, linearized copies of input PDFs for the viewer, written by src/ingest.py.
+VIEWER_DIR = '.viewer'
+
+_etag_cache = {}
+_etag_lock = threading.Lock()
+
+
+def write_precompressed(path):
+    """
+    Writes gzip (and, when available, brotli) copies of a file next to it, so
+    they can be served as-is instead of compressing on every request.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 keeps the gzip bytes, and so their ETag, stable across rewrites.
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+    elif os.path.exists(path + '.br'):
+        os.remove(path + '.br')
+
+
+def write_json(path, data):
+    """Saves analysis JSON and its precompressed variants."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+    write_precompressed(path)
+
+
+def content_etag(path):
+    """
+    Returns a strong ETag (SHA-256 of the content) for a file. Hashes are cached
+    per path and recomputed only when the file's size or mtime changes.
+    """
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _etag_lock:
+        cached = _etag_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()
+
+    with _etag_lock:
+        _etag_cache[path] = (key, etag)
+    return etag
+
+
+def choose_variant(path, accept_encodings):
+    """
+    Picks the best precompressed variant of `path` the client accepts.
+    `accept_encodings` is Werkzeug's parsed Accept-Encoding header. Variants
+    older than the original file are ignored. Returns (variant_path, encoding),
+    with encoding None when the original should be sent.
+    """
+    original_mtime = os.stat(path).st_mtime_ns
+    for encoding, suffix in VARIANTS:
+        variant = path + suffix
+        if accept_encodings.quality(encoding) <= 0 or not os.path.exists(variant):
+            continue
+        if os.stat(variant).st_mtime_ns >= original_mtime:
+            return variant, encoding
+    return path, None
+
+
+def viewer_filename(directory, filename):
+    """
+    Returns the name (relative to `directory`) of the file to send the viewer
+    for `filename`: its optimized copy under VIEWER_DIR when one exists and is
+    not older than the original, else `filename` itself.
+    """
+    original = os.path.join(directory, filename)
+    optimized = os.path.join(directory, VIEWER_DIR, filename)
+    if os.path.isfile(optimized) and os.stat(optimized).st_mtime_ns >= os.stat(original).st_mtime_ns:
+        return os.path.join(VIEWER_DIR, filename)
+    return filename
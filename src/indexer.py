@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import time
+
+from pdf_extractor import PDFExtractor, load_model
+from profiling import NULL_PROFILER
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_pdfs(root):
+    """
+    Yields the paths of all PDFs under `root`, relative to it, in a stable
+    order. Hidden directories, such as the viewer copies in input/.viewer, are skipped.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.lower().endswith('.pdf'):
+                yield os.path.relpath(os.path.join(dirpath, filename), root)
+
+
+class Manifest:
+    """
+    An append-only JSONL record of every indexed file: its path, size, mtime,
+    SHA-256 and outcome. When a path appears more than once the last record
+    wins, so updating a file's entry never rewrites the manifest.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interrupted run; the file is redone.
+                        continue
+                    self.entries[record['path']] = record
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, **record):
+        self.entries[record['path']] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def index_directory(root, output_path, manifest_path=None, model_path='src/heading_classifier.joblib',
+                    profiler=NULL_PROFILER):
+    """
+    Extracts the outline of every new or changed PDF under `root` and appends
+    it to the JSONL file `output_path` as soon as it is done. Unchanged files,
+    judged by size and mtime first and by content hash second, are skipped, so
+    an interrupted run resumes where it stopped. Files that failed last time
+    are tried again. Readers of the output should keep the last line per
+    `source_file`, as a changed or retried file is appended again. Returns the
+    counts per outcome, or None if the heading classifier could not be loaded.
+    """
+    try:
+        model = load_model(model_path)
+    except Exception as e:
+        print(f"Error: Could not load the heading classifier from '{model_path}': {e}. Nothing was indexed.")
+        return None
+    manifest = Manifest(manifest_path or output_path + '.manifest.jsonl')
+    counts = {"processed": 0, "unchanged": 0, "errors": 0, "removed": 0}
+    seen = set()
+    start = time.perf_counter()
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        for rel_path in scan_pdfs(root):
+            seen.add(rel_path)
+            full_path = os.path.join(root, rel_path)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+
+            previous = manifest.entries.get(rel_path)
+            # Only a successful result is kept; a file that failed is retried,
+            # since the cause may have been transient.
+            if previous and (previous.get('removed') or previous['status'] != 'done'):
+                previous = None
+            if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime:
+                counts["unchanged"] += 1
+                continue
+
+            sha256 = file_sha256(full_path)
+            entry = {"path": rel_path, "size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+            if previous and previous['sha256'] == sha256:
+                # Touched but not modified: refresh the stat fields only.
+                manifest.record(**entry, status=previous['status'])
+                counts["unchanged"] += 1
+                continue
+
+            print(f"Processing for Round 1A: '{rel_path}'...")
+            try:
+                with profiler.stage("extraction"), profiler.document(rel_path), \
+                        PDFExtractor(full_path, model=model) as extractor:
+                    title, headings = extractor.extract_structure()
+                result = {"source_file": rel_path, "sha256": sha256, "title": title, "outline": headings}
+                status = "done"
+                counts["processed"] += 1
+            except Exception as e:
+                print(f"An error occurred while processing {rel_path}: {e}")
+                result = {"source_file": rel_path, "sha256": sha256, "error": str(e)}
+                status = "error"
+                counts["errors"] += 1
+
+            # The outline is written before the manifest entry, so a crash in
+            # between only means the file is processed again on resume.
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            manifest.record(**entry, status=status)
+
+        for rel_path, previous in list(manifest.entries.items()):
+            if rel_path not in seen and not previous.get('removed'):
+                out.write(json.dumps({"source_file": rel_path, "removed": True}) + "\n")
+                out.flush()
+                manifest.record(path=rel_path, removed=True)
+                counts["removed"] += 1
+
+    manifest.close()
+    elapsed = time.perf_counter() - start
+    print(f"\nIndexed '{root}' in {elapsed:.1f}s: {counts['processed']} processed, "
+          f"{counts['unchanged']} unchanged, {counts['errors']} errors, {counts['removed']} removed.")
+    print(f"Outlines appended to '{output_path}'.")
+    return counts
@@ -0,0 +1,131 @@
+import argparse
+import os
+import time
+import fitz  # PyMuPDF
+from delivery import VIEWER_DIR
+from indexer import scan_pdfs
+
+# MuPDF 1.22 and later reject linear=True with this message.
+LINEARISATION_UNSUPPORTED = "Linearisation is no longer supported"
+
+
+def optimize_pdf(src_path, dst_path):
+    """
+    Writes a copy of `src_path` for the viewer: unused objects are dropped and
+    duplicates merged (garbage=4) and streams are deflated. Linearization is
+    attempted too, but MuPDF 1.22 and later (including the pinned PyMuPDF
+    1.26.3) refuse it, so with those the copy is only compacted.
+    Returns True when the copy is linearized.
+    """
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = dst_path + '.tmp'
+    linear = True
+    with fitz.open(src_path) as doc:
+        try:
+            doc.save(tmp_path, garbage=4, deflate=True, clean=True, linear=True)
+        except fitz.mupdf.FzErrorArgument as e:
+            # Only the refusal to linearize falls back to a plain save; any
+            # other failure to write the copy is raised.
+            if LINEARISATION_UNSUPPORTED not in str(e):
+                raise
+            linear = False
+            doc.save(tmp_path, garbage=4, deflate=True, clean=True)
+    os.replace(tmp_path, dst_path)
+    return linear
+
+
+def _is_current(path, src_path):
+    return os.path.exists(path) and os.stat(path).st_mtime_ns >= os.stat(src_path).st_mtime_ns
+
+
+def first_page_ms(path, repeat=3):
+    """
+    Milliseconds to open the PDF at `path` and render its first page, the
+    best of `repeat` runs. Reads from local disk, so this is parse and render
+    time, not network transfer.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with fitz.open(path) as doc:
+            if len(doc):
+                doc.load_page(0).get_pixmap()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def optimize_directory(input_dir, force=False):
+    """
+    Writes an optimized copy of every PDF under `input_dir` to `input_dir`/.viewer,
+    leaving the originals untouched for extraction. Copies newer than their
+    original are kept unless `force` is set. A copy that is neither smaller
+    than its original nor linearized is discarded, so the viewer keeps getting
+    the original, and a `.skip` marker in its place stops later runs from
+    optimizing that file again until it changes.
+    Returns one report row per PDF, with the time to open each version and
+    render its first page.
+    """
+    report = []
+    for rel_path in scan_pdfs(input_dir):
+        src_path = os.path.join(input_dir, rel_path)
+        dst_path = os.path.join(input_dir, VIEWER_DIR, rel_path)
+        skip_path = dst_path + '.skip'
+        if not force and (_is_current(dst_path, src_path) or _is_current(skip_path, src_path)):
+            continue
+
+        try:
+            linear = optimize_pdf(src_path, dst_path)
+        except Exception as e:
+            print(f"Warning: Could not optimize '{rel_path}': {e}")
+            continue
+
+        original_bytes = os.path.getsize(src_path)
+        optimized_bytes = os.path.getsize(dst_path)
+        if optimized_bytes >= original_bytes and not linear:
+            os.remove(dst_path)
+            open(skip_path, 'w').close()
+            optimized_bytes = original_bytes
+        elif os.path.exists(skip_path):
+            os.remove(skip_path)
+
+        report.append({
+            "file": rel_path,
+            "original_bytes": original_bytes,
+            "optimized_bytes": optimized_bytes,
+            "linearized": linear and os.path.exists(dst_path),
+            "original_first_page_ms": first_page_ms(src_path),
+            "optimized_first_page_ms": first_page_ms(dst_path if os.path.exists(dst_path) else src_path),
+        })
+    return report
+
+
+def print_report(report):
+    if not report:
+        print("No PDFs needed optimizing.")
+        return
+    print(f"{'file':<40} {'original':>10} {'optimized':>10} {'saved':>7} {'linear':>6} "
+          f"{'first page ms':>18}")
+    for row in report:
+        saved = 1 - row["optimized_bytes"] / row["original_bytes"] if row["original_bytes"] else 0.0
+        print(f"{row['file'][:40]:<40} {row['original_bytes']:>10} {row['optimized_bytes']:>10} "
+              f"{saved:>7.1%} {'yes' if row['linearized'] else 'no':>6} "
+              f"{row['original_first_page_ms']:>8.1f} -> {row['optimized_first_page_ms']:>6.1f}")
+
+    original = sum(row["original_bytes"] for row in report)
+    optimized = sum(row["optimized_bytes"] for row in report)
+    print(f"\n{len(report)} PDFs: {original} -> {optimized} bytes "
+          f"({1 - optimized / original if original else 0.0:.1%} saved), "
+          f"{sum(row['linearized'] for row in report)} linearized")
+    print(f"first page: {sum(row['original_first_page_ms'] for row in report):.0f} ms -> "
+          f"{sum(row['optimized_first_page_ms'] for row in report):.0f} ms in total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write compacted copies of input PDFs for the viewer. Originals are left as they are."
+    )
+    parser.add_argument("input_dir", nargs="?", default="input", help="Directory of PDFs (default: input).")
+    parser.add_argument("--force", action="store_true", help="Rewrite copies that are already up to date.")
+    args = parser.parse_args()
+    print_report(optimize_directory(args.input_dir, force=args.force))
@@ -1,12 +1,19 @@
 import argparse
-import json
 import os
+import sys
 import datetime
-from pdf_extractor import PDFExtractor
 from persona_analyzer import PersonaAnalyzer
+from delivery import write_json
+from profiling import Profiler, NULL_PROFILER, profiling
+# PDFExtractor and the indexer (PyMuPDF, numpy, joblib) are imported where they
+# are used, so a command handed to the daemon never loads them in the client.
+
+# Default cap on the ranked sections written by Round 1B; 0 keeps them all.
+DEFAULT_TOP_K = 0
 
 def run_round_1a(args):
     """Handles the logic for Round 1A: Extracting outlines from PDFs."""
+    from pdf_extractor import PDFExtractor
     all_results = []
     for pdf_file in args.pdf_files:
         if not os.path.exists(pdf_file):
@@ -15,8 +22,9 @@ def run_round_1a(args):
 
         print(f"Processing for Round 1A: '{os.path.basename(pdf_file)}'...")
         try:
-            extractor = PDFExtractor(pdf_file)
-            title, headings = extractor.extract_structure()
+            with args.profiler.stage("extraction"), args.profiler.document(pdf_file), \
+                    PDFExtractor(pdf_file) as extractor:
+                title, headings = extractor.extract_structure()
             
             output_data = {
                 "source_file": os.path.basename(pdf_file),
@@ -42,10 +50,12 @@ def run_round_1a(args):
 
     if args.output and all_results:
         # Save results to a file
-        save_output(args.output, all_results)
+        with args.profiler.stage("output"):
+            save_output(args.output, all_results)
 
 def run_round_1b(args):
     """Handles the logic for Round 1B: Persona-driven analysis."""
+    from pdf_extractor import PDFExtractor
     if not args.output:
         print("Error: An output file must be specified for Round 1B analysis using the -o flag.")
         return
@@ -61,8 +71,9 @@ def run_round_1b(args):
             continue
         try:
             print(f"  - Processing '{os.path.basename(pdf_file)}'")
-            extractor = PDFExtractor(pdf_file)
-            title, headings = extractor.extract_structure()
+            with args.profiler.stage("extraction"), args.profiler.document(pdf_file), \
+                    PDFExtractor(pdf_file) as extractor:
+                title, headings = extractor.extract_structure()
             document_outlines.append({
                 "source_file": os.path.basename(pdf_file),
                 "title": title,
@@ -78,9 +89,10 @@ def run_round_1b(args):
     # Step 2: Analyze the outlines with the PersonaAnalyzer
     print(f"\nAnalyzing {len(document_outlines)} documents for persona: '{args.persona}'...")
     try:
-        analyzer = PersonaAnalyzer(args.persona, args.job)
-        # CORRECTED: Unpack the two lists returned by the analyzer
-        extracted_sections, subsection_analysis = analyzer.analyze_documents(document_outlines)
+        with args.profiler.stage("analysis"):
+            analyzer = PersonaAnalyzer(args.persona, args.job, top_k=args.top_k or None)
+            # CORRECTED: Unpack the two lists returned by the analyzer
+            extracted_sections, subsection_analysis = analyzer.analyze_documents(document_outlines)
 
         # Step 3: Structure the final output as per Round 1B requirements
         final_output = {
@@ -88,16 +100,18 @@ def run_round_1b(args):
                 "input_documents": [os.path.basename(f) for f in args.pdf_files],
                 "persona": args.persona,
                 "job_to_be_done": args.job,
-                "processing_timestamp": datetime.datetime.now().isoformat()
+                "processing_timestamp": datetime.datetime.now().isoformat(),
+                "total_sections": analyzer.total_sections,
+                "top_k": args.top_k
             },
             # Use the correct variables for the output
             "extracted_sections": extracted_sections,
             "subsection_analysis": subsection_analysis
         }
 
-        # Save the final JSON output
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(final_output, f, indent=4)
+        # Save the final JSON output, with precompressed copies for the viewer
+        with args.profiler.stage("output"):
+            write_json(args.output, final_output)
         
         print(f"\nSuccessfully completed Round 1B analysis. Results saved to '{args.output}'.")
 
@@ -108,9 +122,8 @@ def save_output(output_path, results):
     """Saves the output to a file, either as JSON or plain text."""
     try:
         if output_path.lower().endswith('.json'):
-            with open(output_path, 'w', encoding='utf-8') as f:
-                output = results[0] if len(results) == 1 else results
-                json.dump(output, f, indent=4)
+            output = results[0] if len(results) == 1 else results
+            write_json(output_path, output)
             print(f"\nSuccessfully saved JSON data to '{output_path}'.")
         else:
             with open(output_path, 'w', encoding='utf-8') as f:
@@ -134,20 +147,72 @@ def main():
     parser = argparse.ArgumentParser(
         description="A tool for PDF structural and persona-based analysis."
     )
-    parser.add_argument("pdf_files", nargs='+', type=str, help="Path(s) to the input PDF file(s).")
+    parser.add_argument("pdf_files", nargs='*', type=str, help="Path(s) to the input PDF file(s).")
     parser.add_argument("-o", "--output", type=str, help="Path to the output file.")
+
+    # Directory mode: incremental Round 1A over every PDF under a directory
+    parser.add_argument("--index-dir", type=str,
+                        help="Index all PDFs under this directory, streaming outlines to the -o JSONL file.")
+    parser.add_argument("--manifest", type=str,
+                        help="Manifest file for --index-dir (default: <output>.manifest.jsonl).")
+
+    # Profiling
+    parser.add_argument("--profile", type=str, metavar="REPORT_JSON",
+                        help="Profile the run and write a JSON report to this path.")
+    parser.add_argument("--profile-cprofile", type=str, metavar="STATS_FILE",
+                        help="With --profile, also dump cProfile stats of the hot stage here.")
+    parser.add_argument("--profile-stage", type=str, default="extraction",
+                        help="Stage to run under cProfile (default: extraction).")
+    parser.add_argument("--profile-top", type=int, default=5,
+                        help="Number of slowest documents to report (default: 5).")
     
     # Add arguments for Round 1B
     parser.add_argument("--persona", type=str, help="Persona description for Round 1B analysis.")
     parser.add_argument("--job", type=str, help="Job-to-be-done description for Round 1B analysis.")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K,
+                        help=f"Keep only the top K ranked sections in Round 1B (default: {DEFAULT_TOP_K}; 0 keeps all).")
+
+    # Resident daemon (src/daemon.py)
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Run in this process even when a daemon is listening.")
 
     args = parser.parse_args()
 
+    if args.index_dir and not args.output:
+        parser.error("--index-dir needs an output JSONL file given with -o.")
+    if not args.index_dir and not args.pdf_files:
+        parser.error("the following arguments are required: pdf_files")
+
+    if not args.profile:
+        args.profiler = NULL_PROFILER
+        run(args)
+        return
+
+    args.profiler = Profiler(hot_stage=args.profile_stage, cprofile_path=args.profile_cprofile,
+                             top_n=args.profile_top)
+    with profiling(args.profiler):
+        run(args)
+    args.profiler.write_report(args.profile)
+    args.profiler.print_summary()
+    print(f"Profile report saved to '{args.profile}'.")
+
+def run(args):
+    """Runs the mode selected by the parsed arguments."""
+    if args.index_dir:
+        from indexer import index_directory
+        index_directory(args.index_dir, args.output, manifest_path=args.manifest, profiler=args.profiler)
     # Decide which round to run based on the provided arguments
-    if args.persona and args.job:
+    elif args.persona and args.job:
         run_round_1b(args)
     else:
         run_round_1a(args)
 
 if __name__ == "__main__":
-    main()
+    # Hand the command to a running daemon, where everything is already loaded;
+    # without one, run it here.
+    from daemon import run_in_daemon
+    exit_code = run_in_daemon(sys.argv[1:], sys.argv[0])
+    if exit_code is None:
+        main()
+    else:
+        sys.exit(exit_code)
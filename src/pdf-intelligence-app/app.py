@@ -1,70 +1,335 @@
 import os
+import io
 import datetime
 import json
-from flask import Flask, request, jsonify, render_template
+import math
+from flask import Flask, Blueprint, Request, Response, current_app, request, jsonify, render_template
 from werkzeug.utils import secure_filename
-from src.main import run_analysis_pipeline
+from src.main import run_analysis_pipeline, run_batch_analysis_pipeline
+from src.job_queue import JobQueue, QueueFull
+from src.ingest import read_uploads, close_uploads, UploadTooLarge, MAX_FILE_BYTES, MAX_REQUEST_BYTES, SPILL_THRESHOLD_BYTES
+from src.models import preload_models
+from src.workspace import Workspace, sweep_stale_workspaces, WORKSPACE_ROOT
+from src.metrics import registry, HTTP_IN_FLIGHT
+from src.admission import AdmissionController, AdmissionRejected, estimate_work, run_admitted
 
-# Initialize the Flask app
-# It looks for the HTML file in a 'frontend' folder.
-app = Flask(__name__, template_folder='frontend', static_folder='frontend')
+bp = Blueprint('analysis', __name__)
 
-# Configuration for file uploads
-# A folder named 'input' will be created to temporarily store uploaded files.
-UPLOAD_FOLDER = 'input'
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+class InMemoryUploadRequest(Request):
+    """
+    Werkzeug spools every multipart file over 500 KB to a temporary file while
+    parsing the form. Bodies below the spill threshold are kept in memory instead.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= current_app.config['UPLOAD_SPILL_THRESHOLD']:
+            return io.BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+def create_app(config=None, preload=False):
+    """
+    Application factory. `config` overrides the environment-derived settings.
+    With `preload=True` all models are loaded before returning, so a pre-forking
+    server can share them between its worker processes (see serve.py).
+    """
+    # Initialize the Flask app
+    # It looks for the HTML file in a 'frontend' folder.
+    app = Flask(__name__, template_folder='frontend', static_folder='frontend')
+
+    # Configuration for file uploads
+    # Uploaded PDFs are read straight into memory; only files above the spill
+    # threshold touch the disk, as temporary files removed after the analysis.
+    app.config['MAX_UPLOAD_FILE_BYTES'] = int(os.environ.get('MAX_UPLOAD_FILE_BYTES', MAX_FILE_BYTES))
+    app.config['MAX_UPLOAD_REQUEST_BYTES'] = int(os.environ.get('MAX_UPLOAD_REQUEST_BYTES', MAX_REQUEST_BYTES))
+    app.config['UPLOAD_SPILL_THRESHOLD'] = int(os.environ.get('UPLOAD_SPILL_THRESHOLD', SPILL_THRESHOLD_BYTES))
+    # Every request and job gets its own scratch directory under this root.
+    app.config['WORKSPACE_ROOT'] = WORKSPACE_ROOT
+
+    # Maximum number of persona/job queries in one /analyze/batch request.
+    app.config['MAX_BATCH_QUERIES'] = int(os.environ.get('MAX_BATCH_QUERIES', 50))
+
+    # Background analysis jobs are processed by a bounded pool of worker threads.
+    # JOB_QUEUE_DEPTH caps how many jobs may wait for a free worker.
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['JOB_QUEUE_DEPTH'] = int(os.environ.get('JOB_QUEUE_DEPTH', 16))
+
+    # Admission control: page and section budgets per request and for all
+    # work in flight, plus how long and how many requests may wait for capacity.
+    app.config['ADMISSION_MAX_REQUEST_PAGES'] = int(os.environ.get('ADMISSION_MAX_REQUEST_PAGES', 500))
+    app.config['ADMISSION_MAX_REQUEST_SECTIONS'] = int(os.environ.get('ADMISSION_MAX_REQUEST_SECTIONS', 5000))
+    app.config['ADMISSION_MAX_INFLIGHT_PAGES'] = int(os.environ.get('ADMISSION_MAX_INFLIGHT_PAGES', 1000))
+    app.config['ADMISSION_MAX_INFLIGHT_SECTIONS'] = int(os.environ.get('ADMISSION_MAX_INFLIGHT_SECTIONS', 10000))
+    app.config['ADMISSION_MAX_WAIT_SECONDS'] = float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', 30))
+    app.config['ADMISSION_MAX_WAITING'] = int(os.environ.get('ADMISSION_MAX_WAITING', 8))
+
+    if config:
+        app.config.update(config)
+
+    # Lets Werkzeug refuse oversized bodies before they are read at all; the
+    # margin leaves room for the form fields and multipart framing.
+    app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_UPLOAD_REQUEST_BYTES'] + 1024 * 1024
+    app.request_class = InMemoryUploadRequest
+    sweep_stale_workspaces(app.config['WORKSPACE_ROOT'])
+
+    app.extensions['job_queue'] = JobQueue(num_workers=app.config['JOB_WORKERS'],
+                                           max_depth=app.config['JOB_QUEUE_DEPTH'])
+    app.extensions['admission'] = AdmissionController(
+        max_request_pages=app.config['ADMISSION_MAX_REQUEST_PAGES'],
+        max_request_sections=app.config['ADMISSION_MAX_REQUEST_SECTIONS'],
+        max_inflight_pages=app.config['ADMISSION_MAX_INFLIGHT_PAGES'],
+        max_inflight_sections=app.config['ADMISSION_MAX_INFLIGHT_SECTIONS'],
+        max_wait_seconds=app.config['ADMISSION_MAX_WAIT_SECONDS'],
+        max_waiting=app.config['ADMISSION_MAX_WAITING'])
+    app.register_blueprint(bp)
+
+    if preload:
+        preload_models()
+    return app
+
+def _job_queue():
+    return current_app.extensions['job_queue']
+
+def _admission():
+    return current_app.extensions['admission']
+
+def _rejection(e):
+    """Turns an AdmissionRejected into an error response with Retry-After, and logs it."""
+    current_app.logger.warning("Rejected %s %s with %d: %s", request.method, request.path, e.status, e)
+    headers = {"Retry-After": str(e.retry_after)} if e.retry_after else {}
+    return jsonify({"error": str(e)}), e.status, headers
 
-@app.route('/')
+@bp.before_request
+def _count_in_flight():
+    HTTP_IN_FLIGHT.inc(endpoint=request.endpoint)
+
+@bp.teardown_request
+def _uncount_in_flight(exc=None):
+    HTTP_IN_FLIGHT.dec(endpoint=request.endpoint)
+
+@bp.route('/')
 def index():
     """Serves the main HTML page."""
     return render_template('index.html')
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
+@bp.route('/metrics')
+def metrics():
+    """Exposes this process's metrics in the Prometheus text format."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def _parse_analysis_request(workspace, require_query=True):
     """
-    API endpoint to handle file uploads and trigger the analysis pipeline.
+    Validates the upload form and reads the PDFs into memory, spilling large
+    ones into the request's private workspace.
+    Returns (uploads, persona, job_to_be_done, None) on success, or
+    (None, None, None, error_response) when the request is invalid.
     """
     # --- 1. Get data from the request ---
     if 'files' not in request.files:
-        return jsonify({"error": "No files part in the request"}), 400
+        return None, None, None, (jsonify({"error": "No files part in the request"}), 400)
 
     files = request.files.getlist('files')
     persona = request.form.get('persona', '')
     job_to_be_done = request.form.get('job', '')
 
     if not files or files[0].filename == '':
-        return jsonify({"error": "No selected files"}), 400
+        return None, None, None, (jsonify({"error": "No selected files"}), 400)
     
-    if not persona or not job_to_be_done:
-        return jsonify({"error": "Persona and Job-to-be-Done are required fields"}), 400
-
-    # --- 2. Save uploaded files temporarily ---
-    doc_paths = []
-    for file in files:
-        if file and file.filename.lower().endswith('.pdf'):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            doc_paths.append(filepath)
-
-    if not doc_paths:
-        return jsonify({"error": "No valid PDF files were uploaded"}), 400
-
-    # --- 3. Run the analysis pipeline ---
+    if require_query and (not persona or not job_to_be_done):
+        return None, None, None, (jsonify({"error": "Persona and Job-to-be-Done are required fields"}), 400)
+
+    # --- 2. Read uploaded files into memory ---
+    pdf_files = [(secure_filename(file.filename), file.stream)
+                 for file in files if file and file.filename.lower().endswith('.pdf')]
     try:
-        result = run_analysis_pipeline(doc_paths, persona, job_to_be_done)
+        uploads = read_uploads(pdf_files,
+                               max_file_bytes=current_app.config['MAX_UPLOAD_FILE_BYTES'],
+                               max_request_bytes=current_app.config['MAX_UPLOAD_REQUEST_BYTES'],
+                               spill_threshold=current_app.config['UPLOAD_SPILL_THRESHOLD'],
+                               spill_dir=workspace.path)
+    except UploadTooLarge as e:
+        return None, None, None, (jsonify({"error": str(e)}), 413)
+
+    if not uploads:
+        return None, None, None, (jsonify({"error": "No valid PDF files were uploaded"}), 400)
+
+    return uploads, persona, job_to_be_done, None
+
+def _release(uploads, workspace):
+    """Frees a finished request's or job's uploads and removes its workspace."""
+    close_uploads(uploads or [])
+    workspace.cleanup()
+
+def _use_cache():
+    """A 'no_cache' form field or query parameter set to 1/true bypasses the result cache."""
+    flag = request.values.get('no_cache', '').lower()
+    return flag not in ('1', 'true', 'yes')
+
+def _deadline_seconds():
+    """
+    Reads the 'deadline_seconds' form field or query parameter, which overrides
+    ANALYSIS_DEADLINE_SECONDS. Returns (seconds or None, None), or
+    (None, error_response) unless it is a finite number >= 0.
+    """
+    raw = request.values.get('deadline_seconds')
+    if raw is None or raw == '':
+        return None, None
+    try:
+        seconds = float(raw)
+    except ValueError:
+        seconds = math.nan
+    if not math.isfinite(seconds) or seconds < 0:
+        return None, (jsonify({"error": "'deadline_seconds' must be a number of seconds, 0 or more"}), 400)
+    return seconds, None
+
+@bp.route('/analyze', methods=['POST'])
+def analyze():
+    """
+    API endpoint to handle file uploads and trigger the analysis pipeline.
+    """
+    workspace = Workspace(current_app.config['WORKSPACE_ROOT'])
+    uploads = None
+    try:
+        deadline_seconds, error = _deadline_seconds()
+        if error:
+            return error
+        uploads, persona, job_to_be_done, error = _parse_analysis_request(workspace)
+        if error:
+            return error
+
+        # --- 3. Run the analysis pipeline once there is capacity for it ---
+        estimate = estimate_work(uploads)
+        with _admission().admit(estimate):
+            result = run_analysis_pipeline(uploads, persona, job_to_be_done, use_cache=_use_cache(),
+                                           deadline_seconds=deadline_seconds)
         return jsonify(result)
+    except AdmissionRejected as e:
+        return _rejection(e)
     except Exception as e:
         # Provide a more specific error message if possible
         print(f"Error during analysis: {e}")
         return jsonify({"error": f"An error occurred during analysis: {str(e)}"}), 500
     finally:
-        # --- 4. Clean up the uploaded files ---
-        for path in doc_paths:
-            if os.path.exists(path):
-                os.remove(path)
+        # --- 4. Release the uploaded files and the workspace ---
+        _release(uploads, workspace)
+
+def _parse_batch_queries():
+    """
+    Reads the 'queries' form field: a JSON list of {"persona": ..., "job": ...}
+    objects. Returns (queries, None) or (None, error_response).
+    """
+    try:
+        raw_queries = json.loads(request.form.get('queries', ''))
+    except ValueError:
+        return None, (jsonify({"error": "'queries' must be a JSON list of {\"persona\", \"job\"} objects"}), 400)
+
+    if not isinstance(raw_queries, list) or not raw_queries:
+        return None, (jsonify({"error": "'queries' must be a non-empty JSON list"}), 400)
+    if len(raw_queries) > current_app.config['MAX_BATCH_QUERIES']:
+        return None, (jsonify({"error": f"At most {current_app.config['MAX_BATCH_QUERIES']} queries are allowed per batch"}), 400)
+
+    queries = []
+    for item in raw_queries:
+        persona = item.get('persona', '') if isinstance(item, dict) else ''
+        job_to_be_done = (item.get('job') or item.get('job_to_be_done', '')) if isinstance(item, dict) else ''
+        if not persona or not job_to_be_done:
+            return None, (jsonify({"error": "Every query needs a persona and a job"}), 400)
+        queries.append({"persona": persona, "job_to_be_done": job_to_be_done})
+    return queries, None
+
+@bp.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyzes one set of uploaded PDFs against many persona/job queries. The PDFs
+    are extracted and embedded once; the response holds one result per query.
+    """
+    workspace = Workspace(current_app.config['WORKSPACE_ROOT'])
+    uploads = None
+    try:
+        queries, error = _parse_batch_queries()
+        if error:
+            return error
+        uploads, _, _, error = _parse_analysis_request(workspace, require_query=False)
+        if error:
+            return error
+
+        estimate = estimate_work(uploads)
+        with _admission().admit(estimate):
+            results = run_batch_analysis_pipeline(uploads, queries)
+        return jsonify({"results": results})
+    except AdmissionRejected as e:
+        return _rejection(e)
+    except Exception as e:
+        print(f"Error during batch analysis: {e}")
+        return jsonify({"error": f"An error occurred during analysis: {str(e)}"}), 500
+    finally:
+        _release(uploads, workspace)
+
+@bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queues an analysis job for the uploaded files and returns its id straight away.
+    Poll /jobs/<job_id> for progress and fetch /jobs/<job_id>/result when completed.
+    """
+    workspace = Workspace(current_app.config['WORKSPACE_ROOT'])
+    uploads = None
+    try:
+        deadline_seconds, error = _deadline_seconds()
+        if not error:
+            uploads, persona, job_to_be_done, error = _parse_analysis_request(workspace)
+        if error:
+            _release(uploads, workspace)
+            return error
+
+        # Oversized requests are refused now; others wait for capacity in the queue.
+        estimate = estimate_work(uploads)
+        _admission().check(estimate)
+
+        # From here on the job owns the workspace and releases it when it finishes.
+        job = _job_queue().submit(run_admitted, _admission(), estimate,
+                                  run_analysis_pipeline, uploads, persona, job_to_be_done,
+                                  use_cache=_use_cache(), deadline_seconds=deadline_seconds,
+                                  cleanup=lambda: _release(uploads, workspace))
+    except AdmissionRejected as e:
+        _release(uploads, workspace)
+        return _rejection(e)
+    except QueueFull as e:
+        _release(uploads, workspace)
+        return jsonify({"error": str(e)}), 503
+    except Exception:
+        _release(uploads, workspace)
+        raise
+
+    return jsonify(job.to_dict()), 202, {"Location": f"/jobs/{job.id}"}
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Returns the status and per-stage progress of a job."""
+    job = _job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Returns the analysis output of a completed job."""
+    job = _job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    if job.status == "failed":
+        return jsonify({"error": f"An error occurred during analysis: {job.error}"}), 500
+    if job.status != "completed":
+        return jsonify(job.to_dict()), 409
+    return jsonify(job.result)
+
+@bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancels a queued or running job, e.g. when the client gives up waiting."""
+    job = _job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job.to_dict())
 
 if __name__ == '__main__':
-    # Runs the Flask app. Host='0.0.0.0' makes it accessible from outside the Docker container.
+    # Runs the Flask development server. Use serve.py in production.
+    # Host='0.0.0.0' makes it accessible from outside the Docker container.
+    app = create_app()
     app.run(host='0.0.0.0', debug=True, port=5001)
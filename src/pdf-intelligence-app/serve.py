@@ -0,0 +1,91 @@
+import argparse
+import gc
+import os
+
+from app import create_app
+from src.models import process_memory
+
+
+def _log_memory(label):
+    memory = process_memory()
+    if memory:
+        mib = {key: value / (1024 * 1024) for key, value in memory.items()}
+        print(f"[{label} pid {os.getpid()}] RSS {mib['rss']:.0f} MiB, PSS {mib['pss']:.0f} MiB, "
+              f"shared {mib['shared']:.0f} MiB, private {mib['private']:.0f} MiB")
+
+
+def _run_gunicorn(app, args):
+    from gunicorn.app.base import BaseApplication
+
+    class PreforkServer(BaseApplication):
+        """Serves an already-created app, so workers inherit it by forking."""
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    def post_worker_init(worker):
+        if args.torch_threads:
+            import torch
+            torch.set_num_threads(args.torch_threads)
+        _log_memory("worker")
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'post_worker_init': post_worker_init,
+    }
+    PreforkServer(app, options).run()
+
+
+def main():
+    """
+    Production entry point. Loads every model once in this parent process,
+    then forks the worker processes, which share the model weights copy-on-write.
+    """
+    parser = argparse.ArgumentParser(description="Serve the PDF intelligence app with pre-forked workers.")
+    parser.add_argument("--host", default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 5001)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get('WEB_WORKERS', 2)),
+                        help="Number of worker processes.")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get('WEB_THREADS', 4)),
+                        help="Request threads per worker process.")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get('WEB_TIMEOUT', 300)),
+                        help="Seconds before a silent worker is restarted.")
+    parser.add_argument("--torch-threads", type=int, default=int(os.environ.get('TORCH_THREADS', 0)),
+                        help="Intra-op threads per worker for the encoder (0 keeps the torch default).")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Let every worker load its own models on first use (for memory comparisons).")
+    args = parser.parse_args()
+
+    app = create_app(preload=not args.no_preload)
+    if not args.no_preload:
+        # Move everything allocated so far out of the garbage collector's reach,
+        # so collections in the workers do not write to (and un-share) those pages.
+        gc.freeze()
+    _log_memory("parent")
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("gunicorn is not installed; falling back to a single multi-threaded Werkzeug process.")
+        from werkzeug.serving import run_simple
+        run_simple(args.host, args.port, app, threaded=True)
+        return
+
+    _run_gunicorn(app, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.document_pool import document_pool
+from src.metrics import registry, Counter, Gauge
+from src.pdf_extractor import PDFExtractor
+
+# Sections cannot be counted before extraction, so they are estimated from pages.
+ESTIMATED_SECTIONS_PER_PAGE = 8
+# How long a queued job may wait for capacity before it fails.
+JOB_ADMISSION_WAIT_SECONDS = float(os.environ.get('JOB_ADMISSION_WAIT_SECONDS', 600))
+# Waiting is done in slices of this many seconds, with a cancellation check after each.
+ADMISSION_WAIT_SLICE_SECONDS = 1.0
+
+ADMISSION_DECISIONS = registry.register(Counter(
+    'pdf_admission_decisions_total', 'Admission decisions by outcome.', ['outcome']))
+INFLIGHT_PAGES = registry.register(Gauge(
+    'pdf_admission_inflight_pages', 'Estimated pages of admitted work in flight.'))
+WAITING = registry.register(Gauge(
+    'pdf_admission_waiting', 'Requests waiting for admission.'))
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted. Carries the HTTP status to
+    answer with and, for transient overload, a Retry-After hint in seconds.
+    """
+
+    def __init__(self, message, status, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class WorkEstimate:
+    """The estimated cost of one analysis request."""
+
+    def __init__(self, pages=0, num_bytes=0):
+        self.pages = pages
+        self.num_bytes = num_bytes
+        self.sections = pages * ESTIMATED_SECTIONS_PER_PAGE
+
+    def to_dict(self):
+        return {"pages": self.pages, "bytes": self.num_bytes, "sections": self.sections}
+
+
+def estimate_work(uploads):
+    """
+    Estimates the cost of analysing some uploads from their byte sizes and page
+    counts. Opening a PDF to count its pages only parses the cross-reference
+    table, so this is cheap compared to the analysis itself, and the opened
+    document stays in the DocumentPool for the extraction that follows.
+    Raises AdmissionRejected (422) for an upload that cannot be opened as a
+    PDF, so it is never admitted at an unknown cost.
+    """
+    estimate = WorkEstimate()
+    for upload in uploads:
+        estimate.num_bytes += upload.size
+        try:
+            with document_pool.lease(upload.sha256(), lambda: PDFExtractor._open(upload.source),
+                                     upload.size, upload.data is not None) as doc:
+                estimate.pages += doc.page_count
+        except Exception as e:
+            ADMISSION_DECISIONS.inc(outcome="unreadable")
+            raise AdmissionRejected(f"'{upload.name}' could not be opened as a PDF: {e}", status=422)
+    estimate.sections = estimate.pages * ESTIMATED_SECTIONS_PER_PAGE
+    return estimate
+
+
+class AdmissionController:
+    """
+    Admits analysis work against page and section budgets, both per request and
+    for all work in flight in this process. Work that does not fit the in-flight
+    budget waits up to `max_wait_seconds` for capacity, with at most
+    `max_waiting` requests waiting at once.
+    """
+
+    def __init__(self, max_request_pages=500, max_request_sections=5000,
+                 max_inflight_pages=1000, max_inflight_sections=10000,
+                 max_wait_seconds=30, max_waiting=8):
+        self.max_request_pages = max_request_pages
+        self.max_request_sections = max_request_sections
+        self.max_inflight_pages = max_inflight_pages
+        self.max_inflight_sections = max_inflight_sections
+        self.max_wait_seconds = max_wait_seconds
+        self.max_waiting = max_waiting
+
+        self._condition = threading.Condition()
+        self._inflight_pages = 0
+        self._inflight_sections = 0
+        self._waiting = 0
+        # Moving average of processing time per page, used for Retry-After hints.
+        self._seconds_per_page = 0.5
+
+    def check(self, estimate):
+        """Raises AdmissionRejected (413) if a request exceeds the per-request budget."""
+        if estimate.pages > self.max_request_pages or estimate.sections > self.max_request_sections:
+            ADMISSION_DECISIONS.inc(outcome="too_large")
+            raise AdmissionRejected(
+                f"The request has about {estimate.pages} pages and {estimate.sections} sections; "
+                f"the limit is {self.max_request_pages} pages and {self.max_request_sections} sections per request.",
+                status=413)
+
+    @contextmanager
+    def admit(self, estimate, max_wait_seconds=None, check=None):
+        """
+        Holds the estimated work in the in-flight budget for the wrapped block.
+        Waits for capacity up to `max_wait_seconds` (the controller default when
+        None, forever when negative) and raises AdmissionRejected otherwise.
+        While waiting, `check()` is called at least every
+        ADMISSION_WAIT_SLICE_SECONDS; whatever it raises abandons the wait.
+        """
+        self.check(estimate)
+        if max_wait_seconds is None:
+            max_wait_seconds = self.max_wait_seconds
+
+        with self._condition:
+            if not self._fits(estimate):
+                if self._waiting >= self.max_waiting:
+                    ADMISSION_DECISIONS.inc(outcome="rejected_busy")
+                    raise AdmissionRejected("Too many requests are waiting for capacity.",
+                                            status=429, retry_after=self._retry_after(estimate))
+                self._waiting += 1
+                WAITING.inc()
+                try:
+                    deadline = time.monotonic() + max_wait_seconds if max_wait_seconds >= 0 else None
+                    while not self._fits(estimate):
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            ADMISSION_DECISIONS.inc(outcome="rejected_timeout")
+                            raise AdmissionRejected("The server is at capacity.",
+                                                    status=503, retry_after=self._retry_after(estimate))
+                        if check is not None:
+                            check()
+                            remaining = ADMISSION_WAIT_SLICE_SECONDS if remaining is None else \
+                                min(remaining, ADMISSION_WAIT_SLICE_SECONDS)
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    WAITING.dec()
+            self._inflight_pages += estimate.pages
+            self._inflight_sections += estimate.sections
+            INFLIGHT_PAGES.set(self._inflight_pages)
+            ADMISSION_DECISIONS.inc(outcome="admitted")
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._condition:
+                self._inflight_pages -= estimate.pages
+                self._inflight_sections -= estimate.sections
+                INFLIGHT_PAGES.set(self._inflight_pages)
+                if estimate.pages:
+                    self._seconds_per_page = 0.8 * self._seconds_per_page + 0.2 * (elapsed / estimate.pages)
+                self._condition.notify_all()
+
+    def _fits(self, estimate):
+        # Callers hold self._condition. An idle node always admits a request
+        # that passed the per-request check, so no request can starve forever.
+        if self._inflight_pages == 0 and self._inflight_sections == 0:
+            return True
+        return (self._inflight_pages + estimate.pages <= self.max_inflight_pages and
+                self._inflight_sections + estimate.sections <= self.max_inflight_sections)
+
+    def _retry_after(self, estimate):
+        # Callers hold self._condition. Time until enough in-flight pages drain.
+        excess_pages = self._inflight_pages + estimate.pages - self.max_inflight_pages
+        return max(1, math.ceil(max(excess_pages, 1) * self._seconds_per_page))
+
+
+def run_admitted(admission, estimate, func, *args, progress=None,
+                 max_wait_seconds=JOB_ADMISSION_WAIT_SECONDS, **kwargs):
+    """
+    Runs `func(*args, progress=progress, **kwargs)` once `estimate` is admitted.
+    Used by queued jobs, which wait up to `max_wait_seconds` rather than fail
+    at once. `progress` is called while waiting, so a job cancelled in the
+    meantime stops waiting within ADMISSION_WAIT_SLICE_SECONDS.
+    """
+    check = None
+    if progress is not None:
+        progress("waiting_for_capacity", 0, estimate.pages)
+        check = lambda: progress("waiting_for_capacity", 0, estimate.pages)
+    with admission.admit(estimate, max_wait_seconds=max_wait_seconds, check=check):
+        return func(*args, progress=progress, **kwargs)
@@ -0,0 +1,250 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from src.metrics import registry, Histogram
+
+# Gather concurrent predict/encode calls into shared batches (MICRO_BATCHING=1).
+MICRO_BATCHING = os.environ.get('MICRO_BATCHING', '0') == '1'
+# How long the first call of a batch waits for others to join it.
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2))
+# A batch is run as soon as it holds this many heading-feature rows or texts.
+PREDICT_MAX_BATCH_SIZE = int(os.environ.get('PREDICT_MAX_BATCH_SIZE', 4096))
+ENCODE_MAX_BATCH_SIZE = int(os.environ.get('ENCODE_MAX_BATCH_SIZE', 128))
+# How often a waiting caller checks that the worker thread is still alive.
+WORKER_CHECK_SECONDS = 1.0
+
+BATCH_SIZE = registry.register(Histogram(
+    'pdf_micro_batch_size', 'Items per micro-batched inference call.', ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)))
+BATCH_CALLERS = registry.register(Histogram(
+    'pdf_micro_batch_callers', 'Calls merged into each micro-batched inference call.', ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64)))
+
+
+class _Call:
+    def __init__(self, items):
+        self.items = items
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Merges inference calls from concurrent threads. Each caller submits its
+    own list of items and blocks; a worker thread takes the first waiting call,
+    keeps gathering further calls for up to `max_wait_ms` or until
+    `max_batch_size` items are waiting, runs `infer` once over all of them and
+    hands every caller its own slice of the result. A single call larger than
+    `max_batch_size` runs on its own. `infer` must return one row per item.
+
+    Only the worker thread runs the model, so concurrent requests no longer
+    compete for the model's thread pool. Whatever `infer` raises, including a
+    BaseException that ends the worker, is raised in every caller of the
+    batch. Calls the dying worker had taken but not run go back on the queue,
+    and waiting callers restart a worker that has died, so those calls and
+    the ones queued behind them are served.
+    """
+
+    def __init__(self, infer, name, max_batch_size, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS):
+        self.infer = infer
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._calls = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "batches": 0, "items": 0}
+
+    def submit(self, items):
+        """Runs `infer` over `items` as part of a shared batch and returns this call's results."""
+        if not len(items):
+            return self.infer(items)
+        self._start()
+        call = _Call(items)
+        self._calls.put(call)
+        while not call.done.wait(WORKER_CHECK_SECONDS):
+            self._start()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            batches = self._stats["batches"]
+            return dict(self._stats, mean_batch_size=round(self._stats["items"] / batches, 2) if batches else 0.0)
+
+    def _start(self):
+        # Started on first use, so a batcher created before the server forks has no thread to lose.
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name=f"micro-batch-{self.name}", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        carry, batch = None, []
+        try:
+            while True:
+                batch = [carry or self._calls.get()]
+                carry = None
+                size = len(batch[0].items)
+                deadline = time.monotonic() + self.max_wait
+                while size < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        call = self._calls.get(timeout=remaining) if remaining > 0 else self._calls.get_nowait()
+                    except queue.Empty:
+                        break
+                    if size + len(call.items) > self.max_batch_size:
+                        # Would overflow the batch: it starts the next one instead.
+                        carry = call
+                        break
+                    batch.append(call)
+                    size += len(call.items)
+                self._infer(batch, size)
+                batch = []
+        finally:
+            # The worker is ending: calls it took off the queue but did not
+            # finish go back on it, for the worker a waiting caller restarts.
+            pending = batch + [carry] if carry is not None and carry not in batch else batch
+            for call in pending:
+                if not call.done.is_set():
+                    self._calls.put(call)
+
+    def _infer(self, batch, size):
+        try:
+            if len(batch) == 1:
+                results = [self.infer(batch[0].items)]
+            else:
+                items = []
+                for call in batch:
+                    items.extend(call.items)
+                merged = self.infer(items)
+                results, start = [], 0
+                for call in batch:
+                    results.append(merged[start:start + len(call.items)])
+                    start += len(call.items)
+            for call, result in zip(batch, results):
+                call.result = result
+        except BaseException as e:
+            for call in batch:
+                call.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            with self._lock:
+                self._stats["calls"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["items"] += size
+            BATCH_SIZE.observe(size, model=self.name)
+            BATCH_CALLERS.observe(len(batch), model=self.name)
+            for call in batch:
+                call.done.set()
+
+
+class BatchedPredictor:
+    """A classifier whose predict() calls from all threads are micro-batched."""
+
+    def __init__(self, model, max_batch_size=PREDICT_MAX_BATCH_SIZE, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS):
+        self.model = model
+        self.batcher = MicroBatcher(lambda rows: model.predict(np.asarray(rows)), "heading_classifier",
+                                    max_batch_size, max_wait_ms)
+
+    def predict(self, X):
+        return self.batcher.submit(list(np.asarray(X)))
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class BatchedEncoder:
+    """A SentenceTransformer whose plain encode(texts) calls from all threads are micro-batched."""
+
+    def __init__(self, model, max_batch_size=ENCODE_MAX_BATCH_SIZE, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS):
+        self.model = model
+        self.batcher = MicroBatcher(lambda texts: model.encode(texts), "sentence_encoder",
+                                    max_batch_size, max_wait_ms)
+
+    def encode(self, sentences, **kwargs):
+        # Calls with options, or a single string, bypass batching.
+        if kwargs or isinstance(sentences, str):
+            return self.model.encode(sentences, **kwargs)
+        return self.batcher.submit(list(sentences))
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+_batched = {}
+_batched_lock = threading.Lock()
+
+
+def _shared(model, wrapper):
+    # One wrapper, and so one batch queue, per loaded model.
+    with _batched_lock:
+        if id(model) not in _batched:
+            _batched[id(model)] = (model, wrapper(model))
+        return _batched[id(model)][1]
+
+
+def batched_predictor(model, enabled=None):
+    """Returns the process-wide micro-batched wrapper of a classifier, or the classifier itself when batching is off."""
+    if not (MICRO_BATCHING if enabled is None else enabled):
+        return model
+    return _shared(model, BatchedPredictor)
+
+
+def batched_encoder(model, enabled=None):
+    """Returns the process-wide micro-batched wrapper of an encoder, or the encoder itself when batching is off."""
+    if not (MICRO_BATCHING if enabled is None else enabled):
+        return model
+    return _shared(model, BatchedEncoder)
+
+
+if __name__ == '__main__':
+    # Throughput of the heading classifier, and optionally the encoder, under
+    # N concurrent clients, with and without micro-batching.
+    # Run from the app directory: python -m src.batching --clients 1 4 16
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+    from src.models import get_heading_model, get_sentence_model
+    from src.feature_store import FEATURE_COLUMNS
+
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched inference.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--calls", type=int, default=200, help="Calls per client.")
+    parser.add_argument("--rows", type=int, default=40, help="Feature rows per predict call (about one page).")
+    parser.add_argument("--texts", type=int, default=4, help="Texts per encode call.")
+    parser.add_argument("--encoder", action="store_true", help="Also benchmark the sentence encoder (loads the model).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    classifier, _ = get_heading_model()
+    rows = rng.random((args.rows, len(FEATURE_COLUMNS)))
+    targets = [("predict", lambda model: model.predict(rows), classifier, BatchedPredictor)]
+    if args.encoder:
+        texts = [f"Section {i} about vegetarian dishes for a buffet" for i in range(args.texts)]
+        targets.append(("encode", lambda model: model.encode(texts), get_sentence_model(), BatchedEncoder))
+
+    for label, call, model, wrapper in targets:
+        for clients in args.clients:
+            results = {}
+            for mode, target in (("direct", model), ("batched", wrapper(model))):
+                def client():
+                    for _ in range(args.calls):
+                        call(target)
+                start = time.perf_counter()
+                with ThreadPoolExecutor(clients) as pool:
+                    for future in [pool.submit(client) for _ in range(clients)]:
+                        future.result()
+                results[mode] = clients * args.calls / (time.perf_counter() - start)
+                if mode == "batched":
+                    mean_batch = target.batcher.stats()["mean_batch_size"]
+            print(f"{label:>7}, {clients:>3} clients: direct {results['direct']:8.0f} calls/s, "
+                  f"batched {results['batched']:8.0f} calls/s ({results['batched'] / results['direct']:.2f}x, "
+                  f"mean batch {mean_batch} items)")
@@ -0,0 +1,127 @@
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from src.models import get_sentence_model, SENTENCE_MODEL_NAME, SMALL_SENTENCE_MODEL_NAME, CASCADE_RERANK
+from src.batching import batched_encoder
+
+# Gap between the lowest reranked score and the best small-model-only score.
+TAIL_MARGIN = 0.001
+
+
+class CascadeEngine:
+    """
+    Ranks documents in two tiers. A small, fast encoder scores every document;
+    the `rerank_top` best per query are then re-encoded with the large encoder
+    and reordered by its scores. The rest keep their small-model order, with
+    their small-model scores shifted down so that every one of them stays
+    below the lowest reranked score (the two models' cosine scores are not on
+    the same scale). Has the same interface as SemanticEngine,
+    so RelevanceEngine and the pipelined mode use it unchanged: embeddings from
+    `encode_documents` are small-model embeddings.
+    """
+    def __init__(self, small_model_name: str = SMALL_SENTENCE_MODEL_NAME,
+                 large_model_name: str = SENTENCE_MODEL_NAME, rerank_top: int = CASCADE_RERANK):
+        print("Initializing Cascade Engine...")
+        self.small_model = batched_encoder(get_sentence_model(small_model_name))
+        self.large_model = batched_encoder(get_sentence_model(large_model_name))
+        self.rerank_top = max(1, rerank_top)
+        print("Cascade Engine initialized successfully.")
+
+    def rank(self, query: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.rank_many([query], documents)[0]
+
+    def encode_documents(self, documents: List[Dict[str, Any]]) -> np.ndarray:
+        """Embeds the 'text' of each document with the small encoder; one row per document."""
+        return self.small_model.encode([doc.get('text', '') for doc in documents])
+
+    def rank_many(self, queries: List[str], documents: List[Dict[str, Any]],
+                  doc_embeddings: Optional[np.ndarray] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Ranks the same documents against several queries. Candidates of all
+        queries are re-encoded with the large model in a single batch, so a
+        document shortlisted by more than one query is encoded once.
+        """
+        if not documents:
+            return [[] for _ in queries]
+        if doc_embeddings is None:
+            doc_embeddings = self.encode_documents(documents)
+        coarse = cosine_similarity(self.small_model.encode(queries), doc_embeddings)
+
+        # Shortlist the top `rerank_top` of each query.
+        top = min(self.rerank_top, len(documents))
+        shortlists = [np.argsort(-row, kind='stable')[:top] for row in coarse]
+        candidates = np.unique(np.concatenate(shortlists))
+        large_embeddings = self.large_model.encode([documents[i].get('text', '') for i in candidates])
+        fine = cosine_similarity(self.large_model.encode(queries), large_embeddings)
+        column = {doc_index: j for j, doc_index in enumerate(candidates)}
+
+        rankings = []
+        for q, shortlist in enumerate(shortlists):
+            reranked = sorted(shortlist, key=lambda i: -fine[q, column[i]])
+            shortlisted = set(shortlist.tolist())
+            rest = [i for i in np.argsort(-coarse[q], kind='stable') if i not in shortlisted]
+
+            ranked = []
+            for i in reranked:
+                doc = documents[i].copy() if len(queries) > 1 else documents[i]
+                doc['relevance_score'] = round(float(fine[q, column[i]]), 4)
+                ranked.append(doc)
+            # Keeps scores non-increasing down the list: the tail is shifted to
+            # start TAIL_MARGIN below the last reranked score.
+            offset = 0.0
+            if rest and ranked:
+                offset = max(0.0, float(coarse[q, rest[0]]) - ranked[-1]['relevance_score'] + TAIL_MARGIN)
+            for i in rest:
+                doc = documents[i].copy() if len(queries) > 1 else documents[i]
+                doc['relevance_score'] = round(float(coarse[q, i]) - offset, 4)
+                ranked.append(doc)
+            rankings.append(ranked)
+        return rankings
+
+
+if __name__ == '__main__':
+    # Cascade against large-model-only ranking: latency and top-k agreement.
+    # Run from the app directory: python -m src.cascade input/*.pdf
+    # Set SENTENCE_MODEL and SMALL_SENTENCE_MODEL to local model directories to run offline.
+    import argparse
+    import time
+    from src.main import _extract_document
+    from src.persona_analyzer import SemanticEngine, RelevanceEngine
+
+    parser = argparse.ArgumentParser(description="Compare cascade ranking with the large encoder alone.")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--rerank-top", type=int, default=CASCADE_RERANK or 50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sections = []
+    for pdf in args.pdfs:
+        sections.extend(_extract_document(pdf)[0])
+    query = RelevanceEngine.build_query(
+        "Food Contractor", "Prepare a vegetarian buffet-style dinner menu for a corporate gathering.")
+    large = SemanticEngine()
+    cascade = CascadeEngine(rerank_top=args.rerank_top)
+
+    def best_time(engine):
+        timings, ranked = [], None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            ranked = engine.rank(query, [s.copy() for s in sections])
+            timings.append(time.perf_counter() - start)
+        return min(timings), ranked
+
+    large_secs, large_ranked = best_time(large)
+    cascade_secs, cascade_ranked = best_time(cascade)
+
+    def key(section):
+        return section['document'], section['page_number'], section['section_title']
+
+    large_top = [key(s) for s in large_ranked[:args.top_k]]
+    cascade_top = [key(s) for s in cascade_ranked[:args.top_k]]
+    overlap = len(set(large_top) & set(cascade_top)) / max(1, len(large_top))
+    print(f"{len(sections)} sections, reranking the top {args.rerank_top}")
+    print(f"large only: {large_secs:.2f}s, cascade: {cascade_secs:.2f}s, speedup {large_secs / cascade_secs:.2f}x")
+    print(f"top-{args.top_k} agreement: {overlap:.0%} of sections, same order: {large_top == cascade_top}")
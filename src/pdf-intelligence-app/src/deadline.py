@@ -0,0 +1,124 @@
+import math
+import os
+import threading
+import time
+
+from src.metrics import registry, Counter
+from src.models import model_load_times, CASCADE_RERANK
+
+# Time budget of one analysis in seconds; 0 means no deadline.
+ANALYSIS_DEADLINE_SECONDS = float(os.environ.get('ANALYSIS_DEADLINE_SECONDS', 0))
+# Rough costs used to project whether the rest of an analysis fits its budget.
+# Extraction is projected from the documents parsed so far.
+SEMANTIC_SECONDS_PER_SECTION = float(os.environ.get('DEADLINE_SEMANTIC_SECONDS_PER_SECTION', 0.01))
+REFINE_SECONDS_PER_SECTION = float(os.environ.get('DEADLINE_REFINE_SECONDS_PER_SECTION', 0.1))
+# Load times charged for a model this process has not loaded yet: the
+# sentence encoder(s) for ranking and the spaCy pipeline for refinement.
+ENCODER_LOAD_SECONDS = float(os.environ.get('DEADLINE_ENCODER_LOAD_SECONDS', 10))
+NLP_LOAD_SECONDS = float(os.environ.get('DEADLINE_NLP_LOAD_SECONDS', 3))
+# Pages parsed per document once pages are capped.
+DEADLINE_MAX_PAGES = int(os.environ.get('DEADLINE_MAX_PAGES', 5))
+
+# Degradations, in the order they are applied when time runs short.
+KEYWORD_RANKING = "keyword_ranking"
+SKIP_REFINEMENT = "skip_refinement"
+CAP_PAGES = "cap_pages"
+DEGRADATION_ORDER = (KEYWORD_RANKING, SKIP_REFINEMENT, CAP_PAGES)
+
+DEGRADATIONS_APPLIED = registry.register(Counter(
+    'pdf_deadline_degradations_total', 'Degradations applied to finish analyses within their deadline.',
+    ['degradation']))
+
+
+class Deadline:
+    """
+    Tracks one analysis against its time budget. At each stage boundary the
+    pipeline calls check(), which projects the cost of the remaining work from
+    what has been measured so far. While the projection exceeds the time left,
+    the next degradation in DEGRADATION_ORDER is applied: rank with TF-IDF
+    instead of the encoder, then return section text without summarizing it,
+    then parse at most DEADLINE_MAX_PAGES pages of each remaining document.
+    A Deadline with no budget never degrades anything.
+    """
+
+    def __init__(self, seconds=ANALYSIS_DEADLINE_SECONDS, refine_sections=5):
+        self.seconds = seconds or None
+        self.refine_sections = refine_sections
+        self.start = time.monotonic()
+        self.degradations = []
+        self._documents = 0
+        self._extract_seconds = 0.0
+        self._sections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.seconds is not None
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        return self.seconds - self.elapsed() if self.enabled else math.inf
+
+    def applies(self, degradation):
+        return degradation in self.degradations
+
+    @property
+    def max_pages(self):
+        """The page cap for documents parsed from now on, or None."""
+        return DEADLINE_MAX_PAGES if self.applies(CAP_PAGES) else None
+
+    def record_document(self, seconds, sections):
+        """Records the extraction time and section count of one parsed document."""
+        with self._lock:
+            self._documents += 1
+            self._extract_seconds += seconds
+            self._sections += sections
+
+    def projected_seconds(self, documents_left=0, sections=None):
+        """
+        Projects the seconds still needed for `documents_left` unparsed
+        documents plus ranking and refining `sections` (default: the sections
+        extracted so far, extrapolated to the unparsed documents). A model the
+        remaining stages need but this process has not loaded yet adds its
+        load time.
+        """
+        per_document = self._extract_seconds / self._documents if self._documents else 0.0
+        if sections is None:
+            per_document_sections = self._sections / self._documents if self._documents else 0.0
+            sections = self._sections + per_document_sections * documents_left
+
+        loaded = model_load_times()
+        cost = per_document * documents_left
+        if not self.applies(KEYWORD_RANKING):
+            cost += sections * SEMANTIC_SECONDS_PER_SECTION
+            if 'sentence' not in loaded:
+                cost += ENCODER_LOAD_SECONDS
+            if CASCADE_RERANK and 'sentence_small' not in loaded:
+                cost += ENCODER_LOAD_SECONDS
+        if not self.applies(SKIP_REFINEMENT):
+            cost += min(self.refine_sections, sections) * REFINE_SECONDS_PER_SECTION
+            if 'spacy' not in loaded:
+                cost += NLP_LOAD_SECONDS
+        return cost
+
+    def check(self, documents_left=0, sections=None):
+        """
+        Applies degradations, in order, until the projected remaining work fits
+        in the time left or nothing more can help. Capping pages only helps
+        while documents are left to parse.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            while len(self.degradations) < len(DEGRADATION_ORDER):
+                if self.projected_seconds(documents_left, sections) <= self.remaining():
+                    return
+                degradation = DEGRADATION_ORDER[len(self.degradations)]
+                if degradation == CAP_PAGES and not documents_left:
+                    return
+                self.degradations.append(degradation)
+                DEGRADATIONS_APPLIED.inc(degradation=degradation)
+                print(f"Deadline: {max(0.0, self.remaining()):.1f}s of {self.seconds:.1f}s left, "
+                      f"degrading with {degradation}")
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import re
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from src.metrics import registry, Counter
+
+# Sections whose word-shingle Jaccard similarity reaches this are collapsed.
+DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', '0.85'))
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs at the threshold share a band with near certainty,
+# and every candidate is verified with the exact Jaccard similarity.
+NUM_BANDS = 16
+
+_PRIME = (1 << 32) - 5
+_rng = np.random.default_rng(1)
+# a * x + b stays below 2**64 for 32-bit a, b and x, so uint64 never wraps.
+_A = _rng.integers(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+SECTIONS_DEDUPLICATED = registry.register(Counter(
+    'pdf_sections_deduplicated_total', 'Sections collapsed into a duplicate before ranking, by kind.', ['kind']))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r'\w+', text.lower()))
+
+
+def _shingles(normalized: str) -> set:
+    words = normalized.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {normalized}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _minhash(shingles: set) -> np.ndarray:
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class SectionDeduplicator:
+    """
+    Collapses sections with identical or near-identical text, so each distinct
+    text is embedded and ranked once. Identical texts (after lowercasing and
+    dropping punctuation) are found by hash; near-identical ones by MinHash/LSH
+    over word shingles, confirmed with the exact Jaccard similarity.
+
+    Sections are added one at a time, so this also works on sections streaming
+    in from extraction. Each one is compared against the sections kept so far,
+    and the first one it matches represents it. That representative gets an
+    'also_found_in' list with the document, page and title of each section it
+    absorbed.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.kept = []
+        self._by_hash = {}
+        self._kept_shingles = []
+        self._buckets = {}
+        self._seen = 0
+        self._exact = 0
+        self._near = 0
+
+    def add(self, section: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the kept copy of `section` if its text is new, or None if it was collapsed."""
+        self._seen += 1
+        normalized = _normalize(section.get('text', ''))
+        digest = hashlib.sha1(normalized.encode('utf-8')).digest()
+
+        match = self._by_hash.get(digest)
+        if match is not None:
+            self._exact += 1
+            SECTIONS_DEDUPLICATED.inc(kind="exact")
+        else:
+            shingles = _shingles(normalized)
+            bands = _minhash(shingles).reshape(NUM_BANDS, NUM_PERM // NUM_BANDS)
+            keys = [(band, bands[band].tobytes()) for band in range(NUM_BANDS)]
+
+            candidates = sorted({i for key in keys for i in self._buckets.get(key, ())})
+            match = next((i for i in candidates
+                          if _jaccard(shingles, self._kept_shingles[i]) >= self.threshold), None)
+            if match is None:
+                # A new distinct text: keep it and index it for later sections.
+                self._by_hash[digest] = len(self.kept)
+                for key in keys:
+                    self._buckets.setdefault(key, []).append(len(self.kept))
+                kept = dict(section, also_found_in=[])
+                self.kept.append(kept)
+                self._kept_shingles.append(shingles)
+                return kept
+            self._near += 1
+            SECTIONS_DEDUPLICATED.inc(kind="near")
+            self._by_hash[digest] = match
+
+        self.kept[match]['also_found_in'].append({
+            "document": section["document"],
+            "page_number": section["page_number"],
+            "section_title": section["section_title"],
+        })
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        """Counts for the output metadata."""
+        return {
+            "sections": self._seen,
+            "unique_sections": len(self.kept),
+            "exact_duplicates": self._exact,
+            "near_duplicates": self._near,
+            "encoder_calls_avoided": self._seen - len(self.kept),
+        }
+
+
+def deduplicate_sections(sections: List[Dict[str, Any]],
+                         threshold: float = DEDUP_THRESHOLD) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Runs a SectionDeduplicator over `sections`. Returns the kept sections, in
+    their original order, and the counts for the output metadata.
+    """
+    deduplicator = SectionDeduplicator(threshold)
+    for section in sections:
+        deduplicator.add(section)
+    return deduplicator.kept, deduplicator.stats()
@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from src.metrics import registry, Counter, Gauge, CACHE_REQUESTS
+
+# Estimated MuPDF memory of one parsed page (page tree, fonts, text), on top
+# of the PDF content itself; measured at 0.1-0.7 MiB per page on input/.
+DOCUMENT_POOL_PAGE_BYTES = int(os.environ.get('DOCUMENT_POOL_PAGE_BYTES', 512 * 1024))
+
+DOCUMENT_POOL_EVICTIONS = registry.register(Counter(
+    'pdf_document_pool_evictions_total', 'Open documents closed to stay within the pool caps.'))
+
+
+class _Entry:
+    def __init__(self, doc, size):
+        self.doc = doc
+        self.size = size
+        self.leased = False
+
+
+class DocumentPool:
+    """
+    An LRU pool of open fitz documents keyed by content hash, so a document
+    that is accessed repeatedly (admission's page count, then extraction, or the
+    same PDF in several requests) is parsed once. At most `max_handles`
+    documents stay open, using an estimated `max_bytes` of memory between
+    them; the least recently used idle ones are closed first. A document's
+    memory is estimated as its PDF size plus DOCUMENT_POOL_PAGE_BYTES per page,
+    since MuPDF does not report what one document holds.
+
+    A lease is exclusive: while one caller holds a document nobody else gets
+    it, and a concurrent caller asking for the same key gets a private handle
+    that is closed when its lease ends.
+    """
+
+    def __init__(self, max_handles=32, max_bytes=256 * 1024 * 1024):
+        self.max_handles = max_handles
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "busy": 0, "evictions": 0}
+
+    @contextmanager
+    def lease(self, key, opener, size=0, poolable=True):
+        """
+        Yields the open document for `key`, calling `opener()` to open it on a
+        miss. `size` is the PDF's byte size, used for the memory estimate. A
+        document opened here is only kept if `poolable` and the caller's block
+        finished without an error; one that fails while leased from the pool
+        is closed rather than handed out again. Documents opened from files
+        that will be deleted (spilled uploads) must not be pooled.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.leased:
+                entry.leased = True
+                self._entries.move_to_end(key)
+                self._count("hits", "hit")
+            else:
+                self._count("busy" if entry is not None else "misses", "miss")
+                entry = None
+
+        if entry is not None:
+            ok = False
+            try:
+                yield entry.doc
+                ok = True
+            finally:
+                with self._lock:
+                    entry.leased = False
+                    if not ok and self._entries.get(key) is entry:
+                        self._remove(key)
+                    self._evict()
+            return
+
+        doc = opener()
+        ok = False
+        try:
+            yield doc
+            ok = True
+        finally:
+            pooled = False
+            if ok and poolable:
+                cost = self._cost(doc, size)
+                with self._lock:
+                    if key not in self._entries and self._fits(cost):
+                        self._entries[key] = _Entry(doc, cost)
+                        self._bytes += cost
+                        pooled = True
+                        self._evict()
+            if not pooled:
+                doc.close()
+
+    def clear(self):
+        """Closes every idle document."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if not entry.leased:
+                    self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"] + self._stats["busy"]
+            return dict(self._stats, open_documents=len(self._entries), bytes=self._bytes,
+                        hit_rate=round(self._stats["hits"] / lookups, 4) if lookups else 0.0)
+
+    @staticmethod
+    def _cost(doc, size):
+        return size + doc.page_count * DOCUMENT_POOL_PAGE_BYTES
+
+    def _fits(self, size):
+        # Callers hold self._lock. A single document larger than the whole
+        # budget is never pooled.
+        return self.max_handles > 0 and size <= self.max_bytes
+
+    def _evict(self):
+        # Callers hold self._lock. Closes idle documents, oldest first, until
+        # both caps hold again; leased documents are skipped.
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_handles and self._bytes <= self.max_bytes:
+                break
+            if not self._entries[key].leased:
+                self._remove(key)
+                self._stats["evictions"] += 1
+                DOCUMENT_POOL_EVICTIONS.inc()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        entry.doc.close()
+
+    def _count(self, stat, result):
+        self._stats[stat] += 1
+        CACHE_REQUESTS.inc(cache="document_pool", result=result)
+
+
+document_pool = DocumentPool(
+    max_handles=int(os.environ.get('DOCUMENT_POOL_MAX_HANDLES', 32)),
+    max_bytes=int(os.environ.get('DOCUMENT_POOL_MAX_BYTES', 256 * 1024 * 1024)),
+)
+
+DOCUMENT_POOL_OPEN = registry.register(Gauge(
+    'pdf_document_pool_open_documents', 'Documents held open by the document pool.',
+    callback=lambda: document_pool.stats()["open_documents"]))
@@ -0,0 +1,123 @@
+import os
+
+import fitz  # PyMuPDF
+import numpy as np
+from joblib import Parallel, delayed
+
+from src.models import file_digest
+from src.running_lines import find_running_lines
+
+# Bump whenever extract_line_features changes, so stale cached features are rebuilt.
+FEATURE_VERSION = 2
+FEATURE_COLUMNS = ['font_size', 'is_bold', 'y_position', 'word_count', 'is_all_caps', 'is_centered']
+# Features that are whole numbers. The store keeps all features in one float64
+# matrix, so readers that need the original types cast these back.
+INTEGER_FEATURE_COLUMNS = ['font_size', 'is_bold', 'word_count', 'is_all_caps', 'is_centered']
+STORE_DIR = os.path.join('output', 'feature_store')
+
+
+def extract_line_features(page, line):
+    """
+    Extracts numerical features from a line of text.
+    NOW INCLUDES an 'is_centered' feature.
+    """
+    if not line['spans']:
+        return None
+
+    span = line['spans'][0]
+    text = " ".join(s['text'] for s in line['spans']).strip()
+
+    # --- Feature Engineering ---
+    font_size = round(span['size'])
+    is_bold = 1 if "bold" in span['font'].lower() else 0
+    y_position = line['bbox'][1] / page.rect.height if page.rect.height > 0 else 0
+    word_count = len(text.split())
+    is_all_caps = 1 if text.isupper() and len(text) > 3 else 0
+
+    # --- NEW FEATURE: is_centered ---
+    # Calculates if the line is horizontally centered on the page.
+    page_width = page.rect.width
+    line_center = (line['bbox'][0] + line['bbox'][2]) / 2
+    page_center = page_width / 2
+    # Consider it centered if it's within 5% of the page's center
+    tolerance = page_width * 0.05
+    is_centered = 1 if abs(line_center - page_center) < tolerance else 0
+
+    return [font_size, is_bold, y_position, word_count, is_all_caps, is_centered]
+
+
+def extract_document_features(pdf_path):
+    """
+    Parses a PDF into columnar arrays: one entry per text line with its
+    features ('features', n x 6), its text ('text'), its 1-based page ('page')
+    and whether it is a running header or footer ('running').
+    """
+    features, texts, pages, y_positions = [], [], [], []
+    doc = fitz.open(pdf_path)
+    try:
+        num_pages = len(doc)
+        for pnum, page in enumerate(doc):
+            blocks = page.get_text("dict")["blocks"]
+            for block in blocks:
+                if block['type'] == 0:
+                    for line in block['lines']:
+                        line_features = extract_line_features(page, line)
+                        if line_features:
+                            features.append(line_features)
+                            texts.append(" ".join(s['text'] for s in line['spans']).strip())
+                            pages.append(pnum + 1)
+                            height = page.rect.height
+                            y_positions.append((line['bbox'][1] + line['bbox'][3]) / 2 / height if height > 0 else 0.5)
+    finally:
+        doc.close()
+
+    return {
+        "features": np.array(features, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS)),
+        "text": np.array(texts, dtype=np.str_),
+        "page": np.array(pages, dtype=np.int32),
+        "running": find_running_lines(texts, pages, y_positions, num_pages),
+    }
+
+
+def _build_entry(pdf_path, entry_path):
+    """Extracts one PDF's features and writes them to the store atomically."""
+    columns = extract_document_features(pdf_path)
+    tmp_path = f"{entry_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, entry_path)
+
+
+class FeatureStore:
+    """
+    A columnar on-disk cache of per-line features, one .npz file per PDF keyed
+    by the PDF's content hash and FEATURE_VERSION. Labels are not stored, so a
+    label change or a new hyperparameter setting reuses the cached features
+    without parsing any PDF again.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def entry_path(self, pdf_path):
+        return os.path.join(self.store_dir, f"{file_digest(pdf_path)}_v{FEATURE_VERSION}.npz")
+
+    def load(self, pdf_path):
+        """Returns the cached columns for a PDF, building them first if needed."""
+        entry_path = self.entry_path(pdf_path)
+        if not os.path.exists(entry_path):
+            _build_entry(pdf_path, entry_path)
+        with np.load(entry_path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    def load_many(self, pdf_paths, n_jobs=-1):
+        """
+        Returns the columns of several PDFs, in order. PDFs missing from the
+        store are parsed in parallel worker processes first.
+        """
+        entry_paths = [self.entry_path(p) for p in pdf_paths]
+        missing = [(p, e) for p, e in zip(pdf_paths, entry_paths) if not os.path.exists(e)]
+        if missing:
+            print(f"  - Parsing {len(missing)} of {len(pdf_paths)} PDFs into the feature store...")
+            Parallel(n_jobs=n_jobs)(delayed(_build_entry)(p, e) for p, e in missing)
+        return [self.load(p) for p in pdf_paths]
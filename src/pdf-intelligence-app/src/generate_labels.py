@@ -1,25 +1,40 @@
 import os
 import json
-from pdf_extractor import PDFExtractor # We use the extractor to make predictions
+from src.feature_store import FeatureStore
+from src.models import get_heading_model
+from src.pdf_extractor import PDFExtractor # We use the extractor to make predictions
 
-def generate_json_for_unlabeled_pdfs(pdf_files, input_dir='input'):
+def generate_json_for_unlabeled_pdfs(pdf_files, input_dir='input', store=None, n_jobs=-1):
     """
     Uses the trained model inside PDFExtractor to predict the structure
-    of new PDFs and save them as JSON files.
+    of new PDFs and save them as JSON files. Line features come from the
+    same feature store as training, so PDFs are parsed at most once.
     """
     print("Starting label generation for new PDFs...")
 
+    found = []
     for pdf_filename in pdf_files:
         pdf_path = os.path.join(input_dir, pdf_filename)
         if not os.path.exists(pdf_path):
             print(f"Warning: Could not find '{pdf_filename}'. Skipping.")
             continue
+        found.append((pdf_filename, pdf_path))
 
+    store = store or FeatureStore()
+    columns = store.load_many([pdf_path for _, pdf_path in found], n_jobs=n_jobs)
+    model, _ = get_heading_model()
+
+    for (pdf_filename, _), doc_columns in zip(found, columns):
         print(f"  - Processing: {pdf_filename}")
-        
-        # Use the PDFExtractor to get the model's predictions
-        extractor = PDFExtractor(pdf_path)
-        title, headings = extractor.extract_structure()
+
+        # Predict on the stored features and build the outline like PDFExtractor does
+        title, headings = "No Title Found", []
+        keep = ~doc_columns['running']  # Running headers and footers are never headings.
+        if keep.any():
+            predicted = model.predict(doc_columns['features'][keep])
+            line_references = [{'text': text, 'page': page} for text, page in
+                               zip(doc_columns['text'][keep].tolist(), doc_columns['page'][keep].tolist())]
+            title, headings = PDFExtractor.structure_from_predictions(predicted, line_references)
 
         # Prepare the output in the same format as your other JSON files
         output_data = {
@@ -37,6 +52,7 @@ def generate_json_for_unlabeled_pdfs(pdf_files, input_dir='input'):
         print(f"    -> Successfully created '{json_filename}'")
 
 if __name__ == "__main__":
+    # Run from the app directory: python -m src.generate_labels
     # List of the new PDF files that need JSON labels
     new_pdfs = [
         "Lunch Ideas.pdf",
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import tempfile
+
+# Uploads up to this size stay in memory; anything larger is spilled to a temp file.
+SPILL_THRESHOLD_BYTES = 16 * 1024 * 1024
+# Hard limits for a single uploaded PDF and for all PDFs of one request.
+MAX_FILE_BYTES = 64 * 1024 * 1024
+MAX_REQUEST_BYTES = 256 * 1024 * 1024
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the per-file or per-request byte limit."""
+
+
+class UploadedPDF:
+    """
+    An uploaded PDF held either in memory (`data`) or, above the spill
+    threshold, in a temporary file (`path`). `source` is what PDFExtractor opens.
+    """
+
+    def __init__(self, name, data=None, path=None, size=0):
+        self.name = name
+        self.data = data
+        self.path = path
+        self.size = size
+        self._sha256 = None
+
+    @property
+    def source(self):
+        return self.data if self.data is not None else self.path
+
+    def read_bytes(self):
+        """Returns the full content, reading it back from disk if it was spilled."""
+        if self.data is not None:
+            return self.data
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def sha256(self):
+        """Returns the SHA-256 hex digest of the content, computed once."""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.read_bytes()).hexdigest()
+        return self._sha256
+
+    def close(self):
+        """Releases the buffered content and removes any spill file."""
+        self.data = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+def _open_spill_file(name, spill_dir):
+    """
+    Creates the file an oversized upload is spilled to: under its own name in
+    the request's workspace, or as an anonymous temp file without one.
+    """
+    if spill_dir is None:
+        return tempfile.NamedTemporaryFile(prefix='upload-', suffix='.pdf', delete=False)
+
+    base, ext = os.path.splitext(name or 'upload.pdf')
+    path = os.path.join(spill_dir, base + ext)
+    suffix = 1
+    while True:
+        try:
+            return open(path, 'xb')
+        except FileExistsError:
+            # Two uploads with the same name in one request.
+            path = os.path.join(spill_dir, f"{base}_{suffix}{ext}")
+            suffix += 1
+
+
+def read_upload(name, stream, max_file_bytes=MAX_FILE_BYTES,
+                spill_threshold=SPILL_THRESHOLD_BYTES, max_remaining_bytes=None, spill_dir=None):
+    """
+    Reads an upload stream chunk by chunk into an UploadedPDF. The content stays
+    in memory until it passes `spill_threshold`, after which it continues into a
+    file in `spill_dir` (normally the request's Workspace) or a temporary file.
+    Raises UploadTooLarge as soon as a limit is crossed.
+    """
+    limit = max_file_bytes
+    if max_remaining_bytes is not None:
+        limit = min(limit, max_remaining_bytes)
+
+    chunks = []
+    spill = None
+    size = 0
+    try:
+        while True:
+            chunk = stream.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                if size > max_file_bytes:
+                    raise UploadTooLarge(f"'{name}' is larger than the {max_file_bytes} byte limit per file.")
+                raise UploadTooLarge("The uploaded files exceed the byte limit per request.")
+
+            if spill is None and size > spill_threshold:
+                spill = _open_spill_file(name, spill_dir)
+                spill.write(b"".join(chunks))
+                chunks = []
+            if spill is not None:
+                spill.write(chunk)
+            else:
+                chunks.append(chunk)
+    except Exception:
+        if spill is not None:
+            spill.close()
+            os.remove(spill.name)
+        raise
+
+    if spill is not None:
+        spill.close()
+        return UploadedPDF(name, path=spill.name, size=size)
+    return UploadedPDF(name, data=b"".join(chunks), size=size)
+
+
+def read_uploads(named_streams, max_file_bytes=MAX_FILE_BYTES, max_request_bytes=MAX_REQUEST_BYTES,
+                 spill_threshold=SPILL_THRESHOLD_BYTES, spill_dir=None):
+    """
+    Reads several (name, stream) uploads while enforcing the per-request limit
+    across all of them. On failure, everything read so far is released.
+    """
+    uploads = []
+    total = 0
+    try:
+        for name, stream in named_streams:
+            upload = read_upload(name, stream, max_file_bytes=max_file_bytes,
+                                 spill_threshold=spill_threshold,
+                                 max_remaining_bytes=max_request_bytes - total,
+                                 spill_dir=spill_dir)
+            uploads.append(upload)
+            total += upload.size
+    except Exception:
+        close_uploads(uploads)
+        raise
+    return uploads
+
+
+def close_uploads(uploads):
+    for upload in uploads:
+        upload.close()
@@ -0,0 +1,203 @@
+import os
+import threading
+import queue
+import time
+import uuid
+
+from src.metrics import JOB_QUEUE_DEPTH, JOBS_RUNNING
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its client has cancelled it."""
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is already at its depth limit."""
+
+
+class Job:
+    """
+    A single unit of work tracked by the JobQueue, along with its progress.
+    """
+
+    def __init__(self, func, args, kwargs, cleanup=None):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cleanup = cleanup
+
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = {"done": 0, "total": 0}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed", "cancelled")
+
+    def report_progress(self, stage, done=0, total=0):
+        """
+        Progress callback handed to the pipeline. It doubles as the cancellation
+        checkpoint: a cancelled job stops at the next stage or document boundary.
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+        self.stage = stage
+        self.progress = {"done": done, "total": total}
+
+    def to_dict(self):
+        """Returns the public status view of the job."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    A local, in-process job queue served by a bounded pool of worker threads.
+    Submissions beyond `max_depth` waiting jobs are refused rather than buffered.
+    A job cancelled while queued stops counting toward the depth at once,
+    although a worker still takes it off the queue later and skips it.
+
+    Worker threads are started on first submission in each process, because
+    threads started before a pre-forking server forks do not exist in its workers.
+    """
+
+    def __init__(self, num_workers=2, max_depth=16, retention_seconds=3600):
+        self.num_workers = num_workers
+        self.max_depth = max_depth
+        self.retention_seconds = retention_seconds
+
+        self._queue = queue.Queue()
+        self._queued = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers_pid = None
+
+    @property
+    def depth(self):
+        """Number of jobs waiting for a free worker."""
+        return self._queued
+
+    def submit(self, func, *args, cleanup=None, **kwargs):
+        """
+        Queues `func(*args, progress=..., **kwargs)` and returns the new Job.
+        `cleanup`, if given, runs once the job has finished in any state.
+        """
+        self._prune()
+        job = Job(func, args, kwargs, cleanup=cleanup)
+        with self._lock:
+            self._start_workers()
+            if self._queued >= self.max_depth:
+                raise QueueFull(f"Job queue is full ({self.max_depth} jobs waiting).")
+            self._queue.put_nowait(job)
+            self._queued += 1
+            self._jobs[job.id] = job
+            JOB_QUEUE_DEPTH.set(self._queued)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. Queued jobs are dropped before they start; running jobs
+        stop at their next progress checkpoint. Returns the job, or None.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+
+        job._cancel_event.set()
+        cleanup = None
+        with self._lock:
+            if job.status == "queued":
+                self._queued -= 1
+                JOB_QUEUE_DEPTH.set(self._queued)
+                cleanup = self._finish(job, "cancelled")
+        self._cleanup(job, cleanup)
+        return job
+
+    def _start_workers(self):
+        # Callers hold self._lock.
+        if self._workers_pid == os.getpid():
+            return
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+        self._workers_pid = os.getpid()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with self._lock:
+                    # A job cancelled while queued was already taken off the depth.
+                    if job.status != "queued":
+                        continue
+                    self._queued -= 1
+                    JOB_QUEUE_DEPTH.set(self._queued)
+                    job.status = "running"
+                    job.started_at = time.time()
+                with JOBS_RUNNING.track():
+                    self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        try:
+            result = job.func(*job.args, progress=job.report_progress, **job.kwargs)
+        except JobCancelled:
+            status, result = "cancelled", None
+        except Exception as e:
+            print(f"Error in job {job.id}: {e}")
+            job.error = str(e)
+            status, result = "failed", None
+        else:
+            status = "completed"
+
+        with self._lock:
+            job.result = result
+            cleanup = self._finish(job, status)
+        self._cleanup(job, cleanup)
+
+    def _finish(self, job, status):
+        # Callers hold self._lock. Returns the job's cleanup, which callers run
+        # through _cleanup once they have released the lock.
+        job.status = status
+        job.stage = status
+        job.finished_at = time.time()
+        cleanup, job.cleanup = job.cleanup, None
+        return cleanup
+
+    def _cleanup(self, job, cleanup):
+        # Runs outside self._lock, so removing a workspace never blocks other callers.
+        if cleanup is None:
+            return
+        try:
+            cleanup()
+        except Exception as e:
+            print(f"Error cleaning up job {job.id}: {e}")
+
+    def _prune(self):
+        """Forgets finished jobs older than the retention window."""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
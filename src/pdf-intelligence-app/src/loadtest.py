@@ -0,0 +1,258 @@
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+
+import fitz  # PyMuPDF
+import requests
+
+# Built-in PDF fonts, so generated documents need no font files.
+BODY_FONTS = ["helv", "tiro", "cour"]
+HEADING_FONTS = ["hebo", "tibo", "cobo"]
+
+WORDS = (
+    "menu dinner buffet vegetarian recipe salad roast garden spice sauce grill bake "
+    "season fresh local harvest kitchen guest table course dessert platter soup bread "
+    "plan guide tips travel city coast hotel museum market festival route budget "
+    "form create edit share export review sign document feature workflow team"
+).split()
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def generate_pdf(path, pages=5, headings_per_page=3, font_mix=1.0, seed=0):
+    """
+    Writes a synthetic PDF: a title, then `pages` pages of body text with about
+    `headings_per_page` headings each, and a page-number footer. `font_mix`
+    (0 to 1) is the chance that a heading or paragraph uses a font other than
+    the document's first one. The same arguments always produce the same text.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for pnum in range(pages):
+        page = doc.new_page()
+        width, height = page.rect.width, page.rect.height
+        y = 72
+        if pnum == 0:
+            page.insert_text((72, y), _sentence(rng, 3, 6), fontname="hebo", fontsize=22)
+            y += 40
+
+        # Headings fall at random points in the page's paragraphs.
+        paragraphs = max(headings_per_page, 1) * 2
+        heading_at = set(rng.sample(range(paragraphs), min(headings_per_page, paragraphs)))
+        for i in range(paragraphs):
+            if y > height - 100:
+                break
+            if i in heading_at:
+                font = rng.choice(HEADING_FONTS) if rng.random() < font_mix else HEADING_FONTS[0]
+                size = rng.choice([14, 16, 18])
+                page.insert_text((72, y + 8), _sentence(rng, 2, 5), fontname=font, fontsize=size)
+                y += size + 16
+            font = rng.choice(BODY_FONTS) if rng.random() < font_mix else BODY_FONTS[0]
+            for _ in range(rng.randint(2, 5)):
+                if y > height - 100:
+                    break
+                page.insert_text((72, y), _sentence(rng, 8, 12), fontname=font, fontsize=10)
+                y += 14
+            y += 10
+
+        page.insert_text((width / 2 - 20, height - 36), f"Page {pnum + 1}", fontname="helv", fontsize=9)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def generate_corpus(out_dir, count=20, pages=5, headings_per_page=3, font_mix=1.0, seed=0):
+    """Writes `count` synthetic PDFs to `out_dir` and returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    return [generate_pdf(os.path.join(out_dir, f"synthetic_{i:04d}.pdf"), pages, headings_per_page,
+                         font_mix, seed + i)
+            for i in range(count)]
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def read_server_rss(base_url, timeout=5):
+    """
+    Reads the memory of whichever worker answers the server's /metrics, as a
+    dict with its 'pid', 'rss' and 'pss' in bytes ('pid' and 'pss' are None
+    when the server does not report them), or None when there is no answer.
+    """
+    try:
+        text = requests.get(f"{base_url}/metrics", timeout=timeout).text
+    except requests.RequestException:
+        return None
+    values = {}
+    for line in text.splitlines():
+        for name, key in (("process_resident_memory_bytes", "rss"), ("pdf_process_pss_bytes", "pss"),
+                          ("pdf_process_id", "pid")):
+            if line.startswith(name + " "):
+                values[key] = float(line.split()[-1])
+    if "rss" not in values:
+        return None
+    pid = values.get("pid")
+    return {"pid": int(pid) if pid is not None else None, "rss": values["rss"], "pss": values.get("pss")}
+
+
+def worker_memory(samples):
+    """
+    Returns the last sample of each worker seen in `samples` (by pid), plus
+    their summed RSS and PSS. Workers that never answered a sample are missing.
+    """
+    latest = {}
+    for sample in samples:
+        latest[sample["pid"]] = sample
+    pss = [s["pss"] for s in latest.values()]
+    return {
+        "workers": {str(pid): {"rss": s["rss"], "pss": s["pss"]} for pid, s in latest.items()},
+        "total_rss": sum(s["rss"] for s in latest.values()),
+        "total_pss": sum(pss) if pss and None not in pss else None,
+    }
+
+
+def run_load(base_url, pdf_paths, concurrency=4, total_requests=100, files_per_request=3,
+             persona="Food Contractor", job="Prepare a vegetarian buffet-style dinner menu for a corporate gathering.",
+             use_cache=False, sample_interval=1.0, timeout=300):
+    """
+    Sends `total_requests` /analyze requests from `concurrency` threads, each
+    uploading `files_per_request` of `pdf_paths` in rotation, while sampling
+    the server's RSS every `sample_interval` seconds. Returns a report dict.
+    """
+    contents = {}
+    for path in pdf_paths:
+        with open(path, 'rb') as f:
+            contents[path] = f.read()
+    next_request = iter(range(total_requests))
+    lock = threading.Lock()
+    results = []
+    rss_samples = []
+    done = threading.Event()
+    start = time.perf_counter()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                n = next(next_request, None)
+            if n is None:
+                return
+            chosen = [pdf_paths[(n * files_per_request + i) % len(pdf_paths)] for i in range(files_per_request)]
+            files = [('files', (os.path.basename(p), contents[p], 'application/pdf')) for p in chosen]
+            data = {'persona': persona, 'job': job}
+            if not use_cache:
+                data['no_cache'] = '1'
+            sent = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/analyze", files=files, data=data, timeout=timeout)
+                status = response.status_code
+            except requests.RequestException:
+                status = None
+            with lock:
+                results.append({"latency": time.perf_counter() - sent, "status": status})
+
+    def sampler():
+        while not done.is_set():
+            memory = read_server_rss(base_url)
+            if memory is not None:
+                rss_samples.append(dict(memory, t=round(time.perf_counter() - start, 2)))
+            done.wait(sample_interval)
+
+    sampling = threading.Thread(target=sampler, daemon=True)
+    sampling.start()
+    workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampling.join()
+
+    latencies = sorted(r["latency"] for r in results if r["status"] == 200)
+    errors = sum(1 for r in results if r["status"] != 200)
+    statuses = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    return {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "files_per_request": files_per_request,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "latency_seconds": {f"p{q}": percentile(latencies, q) for q in (50, 95, 99)},
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "statuses": statuses,
+        "rss_bytes": rss_samples,
+        "worker_memory": worker_memory(rss_samples),
+    }
+
+
+def print_report(report):
+    latency = report["latency_seconds"]
+
+    def fmt(seconds):
+        return "n/a" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+    print(f"{report['requests']} requests, {report['concurrency']} clients, "
+          f"{report['files_per_request']} PDFs each, {report['elapsed_seconds']:.1f}s")
+    print(f"throughput {report['throughput_rps']:.2f} req/s")
+    print(f"latency p50 {fmt(latency['p50'])}, p95 {fmt(latency['p95'])}, p99 {fmt(latency['p99'])}")
+    print(f"error rate {report['error_rate']:.2%} (status counts: {report['statuses']})")
+    def mib(value):
+        return "n/a" if value is None else f"{value / 1024 / 1024:.1f} MiB"
+
+    if report["rss_bytes"]:
+        print("server RSS over time, by the worker that answered:")
+        for sample in report["rss_bytes"]:
+            print(f"  {sample['t']:>7.1f}s  pid {sample['pid']}  RSS {mib(sample['rss']):>12}  PSS {mib(sample['pss'])}")
+        memory = report["worker_memory"]
+        print(f"last sample of each of {len(memory['workers'])} workers seen: "
+              f"RSS {mib(memory['total_rss'])} summed, PSS {mib(memory['total_pss'])} summed")
+
+
+if __name__ == "__main__":
+    # Generate a corpus and load a locally running app, e.g.:
+    #   python serve.py --workers 2 &
+    #   python -m src.loadtest --url http://localhost:5001 --concurrency 8 --requests 200
+    parser = argparse.ArgumentParser(description="Generate synthetic PDFs and load-test /analyze.")
+    parser.add_argument("--url", type=str, default="http://localhost:5001", help="Base URL of the app.")
+    parser.add_argument("--corpus-dir", type=str, default="output/loadtest_corpus")
+    parser.add_argument("--documents", type=int, default=20, help="Synthetic PDFs to generate.")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per PDF.")
+    parser.add_argument("--headings-per-page", type=int, default=3)
+    parser.add_argument("--font-mix", type=float, default=1.0,
+                        help="Chance (0-1) that a heading or paragraph uses a varied font.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generate-only", action="store_true", help="Write the corpus and exit.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--files-per-request", type=int, default=3)
+    parser.add_argument("--use-cache", action="store_true", help="Let repeated requests hit the result cache.")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between RSS samples.")
+    parser.add_argument("--report", type=str, help="Also write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    pdfs = generate_corpus(args.corpus_dir, args.documents, args.pages, args.headings_per_page,
+                           args.font_mix, args.seed)
+    print(f"Generated {len(pdfs)} PDFs in '{args.corpus_dir}'.")
+    if args.generate_only:
+        raise SystemExit(0)
+
+    report = run_load(args.url.rstrip('/'), pdfs, args.concurrency, args.requests, args.files_per_request,
+                      use_cache=args.use_cache, sample_interval=args.sample_interval)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        print(f"Report saved to '{args.report}'.")
@@ -1,76 +1,392 @@
 import os
+import time
 import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Union
 
 from src.pdf_extractor import PDFExtractor 
-from src.persona_analyzer import RelevanceEngine
+from src.persona_analyzer import RelevanceEngine, KeywordEngine
 from src.utils import refine_text, structure_content_from_headings
+from src.ingest import UploadedPDF
+from src.models import file_digest, model_versions
+from src.result_cache import result_cache, make_cache_key
+from src.profiling import Profiler, NULL_PROFILER, profiling
+from src.dedup import deduplicate_sections
+from src.document_pool import document_pool
+from src.pipelined import extract_and_rank_pipelined, PIPELINED_DEFAULT
+from src.deadline import Deadline, ANALYSIS_DEADLINE_SECONDS, KEYWORD_RANKING, SKIP_REFINEMENT
+from src.metrics import (STAGE_SECONDS, PAGES_PROCESSED, SECTIONS_PROCESSED, DOCUMENTS_PROCESSED,
+                         RUNNING_LINES_REMOVED, ANALYSES_IN_FLIGHT, CACHE_REQUESTS)
 
-def run_analysis_pipeline(doc_paths: List[str], persona: str, job_to_be_done: str) -> Dict[str, Any]:
+# A document is either a path on disk or an upload that is already in memory.
+Document = Union[str, UploadedPDF]
+
+# Number of top-ranked sections that are refined and returned.
+TOP_N_SECTIONS = 5
+
+def _no_progress(stage: str, done: int = 0, total: int = 0) -> None:
+    pass
+
+def _document_name(doc: Document) -> str:
+    return doc if isinstance(doc, str) else doc.name
+
+def _labels(documents: List[Document]) -> List[str]:
+    """The names documents are reported under in the output."""
+    return [os.path.basename(_document_name(d)) for d in documents]
+
+def _content_hash(doc: Document) -> str:
+    if isinstance(doc, str):
+        return file_digest(doc) if os.path.exists(doc) else f"missing:{doc}"
+    return doc.sha256()
+
+def _cache_versions() -> Dict[str, Any]:
+    return dict(model_versions(), top_n=TOP_N_SECTIONS)
+
+def _replace_documents(result: Dict[str, Any], mapping: Dict[str, str]) -> Dict[str, Any]:
+    """Rewrites the document names in every output entry and the metadata through `mapping`."""
+    for key in ("extracted_section", "sub-section_analysis"):
+        for entry in result.get(key, []):
+            entry["document"] = mapping.get(entry["document"], entry["document"])
+            for source in entry.get("also_found_in", []):
+                source["document"] = mapping.get(source["document"], source["document"])
+    metadata = result.get("metadata", {})
+    if "input_documents" in metadata:
+        metadata["input_documents"] = [mapping.get(name, name) for name in metadata["input_documents"]]
+    if "running_lines_removed" in metadata:
+        metadata["running_lines_removed"] = {mapping.get(name, name): count
+                                             for name, count in metadata["running_lines_removed"].items()}
+    return result
+
+def _deadline_metadata(deadline: Deadline) -> Dict[str, Any]:
+    if not deadline.enabled:
+        return {}
+    return {"deadline_seconds": deadline.seconds, "degradations": list(deadline.degradations)}
+
+def run_analysis_pipeline(documents: List[Document], persona: str, job_to_be_done: str,
+                          progress: Optional[Callable[..., None]] = None,
+                          use_cache: bool = True, profile: Optional[Profiler] = None,
+                          pipelined: Optional[bool] = None,
+                          deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Executes the full document intelligence pipeline over file paths and/or
+    in-memory uploads.
+
+    If `progress` is given it is called as progress(stage, done, total) at each
+    stage and document boundary, so a job runner can report and cancel the work.
+
+    Results are memoized by the documents' content, the persona and job, and the
+    model versions; a repeated query is answered from the cache with a fresh
+    timestamp. Pass use_cache=False to bypass the cache.
+
+    Pass a Profiler as `profile` to record wall and CPU time per stage and per
+    document and the peak allocation of this run; read them from
+    profile.report() afterwards. Profiling implies use_cache=False, so the
+    pipeline actually runs. Raises ProfilerBusy while another profiled run is
+    in progress in this process.
+
+    With `pipelined` (default: PIPELINED_EXECUTION) extraction and encoding run
+    concurrently instead of one stage after the other; see src/pipelined.py.
+
+    With `deadline_seconds` (default: ANALYSIS_DEADLINE_SECONDS, 0 for none)
+    the analysis degrades when it would overrun its budget: keyword ranking,
+    then unrefined section text, then fewer pages per document; see
+    src/deadline.py. The degradations applied are listed in the metadata, and
+    degraded results are not cached.
     """
-    Executes the full document intelligence pipeline.
+    if pipelined is None:
+        pipelined = PIPELINED_DEFAULT
+    deadline = Deadline(ANALYSIS_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds,
+                        refine_sections=TOP_N_SECTIONS)
+    with ANALYSES_IN_FLIGHT.track(), STAGE_SECONDS.time(stage="total"):
+        if profile is not None:
+            with profiling(profile):
+                return _run_pipeline(documents, persona, job_to_be_done, progress, profile, pipelined, deadline)
+        if not use_cache:
+            return _run_pipeline(documents, persona, job_to_be_done, progress,
+                                 pipelined=pipelined, deadline=deadline)
+        return _run_cached_pipeline(documents, persona, job_to_be_done, progress, pipelined, deadline)
+
+def _run_cached_pipeline(documents: List[Document], persona: str, job_to_be_done: str,
+                         progress: Optional[Callable[..., None]] = None,
+                         pipelined: bool = False, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    deadline = deadline or Deadline(None)
+    names = _labels(documents)
+    hashes = [_content_hash(d) for d in documents]
+    cache_key = make_cache_key(hashes, persona, job_to_be_done, _cache_versions())
+
+    # Cached entries name each document by its position among the inputs sorted
+    # by content hash, the order the cache key is built in, so the same files
+    # uploaded under new names are reported under the names used now. Positions
+    # keep apart both identical files under different names and different files
+    # under the same name. A placeholder contains '/' so it is never a real name.
+    placeholders = [""] * len(documents)
+    for position, i in enumerate(sorted(range(len(documents)), key=lambda i: hashes[i])):
+        placeholders[i] = f"/{position}"
+    to_names = dict(zip(placeholders, names))
+
+    cached = result_cache.get(cache_key)
+    CACHE_REQUESTS.inc(cache="result", result="miss" if cached is None else "hit")
+    if cached is not None:
+        print("--- Returning cached analysis result ---")
+        _replace_documents(cached, to_names)
+        cached["metadata"]["processing_timestamp"] = datetime.datetime.now().isoformat()
+        for key in ("deadline_seconds", "degradations"):
+            cached["metadata"].pop(key, None)
+        cached["metadata"].update(_deadline_metadata(deadline))
+        return cached
+
+    result = _run_pipeline(documents, persona, job_to_be_done, progress, pipelined=pipelined, deadline=deadline,
+                           labels=placeholders)
+    # A degraded result is worse than what the same query gets with more time.
+    if result and not deadline.degradations:
+        result_cache.put(cache_key, result)
+    return _replace_documents(result, to_names)
+
+def _run_pipeline(documents: List[Document], persona: str, job_to_be_done: str,
+                  progress: Optional[Callable[..., None]] = None,
+                  profiler=NULL_PROFILER, pipelined: bool = False,
+                  deadline: Optional[Deadline] = None,
+                  labels: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Runs the pipeline uncached. `labels` are the names documents are reported
+    under in the output, by position (default: their base names).
     """
+    if progress is None:
+        progress = _no_progress
+    labels = labels or _labels(documents)
+    deadline = deadline or Deadline(None)
+    # Degradations are decided between stages, so a deadline runs them in sequence.
+    pipelined = pipelined and not deadline.enabled
+
     print("--- Starting Persona-Driven Document Analysis ---")
+
+    if pipelined:
+        # --- 1-3. Structuring, Collapsing and Ranking, overlapped ---
+        with STAGE_SECONDS.time(stage="pipelined"), profiler.stage("pipelined"):
+            ranked_sections, dedup_stats, running_removed, num_sections = extract_and_rank_pipelined(
+                documents, persona, job_to_be_done, progress,
+                lambda doc, label: _extract_document(doc, profiler, label=label), labels=labels)
+        if not ranked_sections:
+            print("Could not extract any sections from the documents. Aborting.")
+            return {}
+        SECTIONS_PROCESSED.inc(num_sections)
+    else:
+        ranked_sections, dedup_stats, running_removed = _extract_and_rank(
+            documents, persona, job_to_be_done, progress, profiler, deadline, labels)
+        if ranked_sections is None:
+            return {}
     
+    # --- 4. Sub-section Analysis & Refinement ---
+    deadline.check(sections=len(ranked_sections))
+    # Out of time, the top sections are returned as extracted, without summarizing.
+    refine = (lambda text: text) if deadline.applies(SKIP_REFINEMENT) else refine_text
+    with STAGE_SECONDS.time(stage="refinement"), profiler.stage("refinement"):
+        extracted_sections_output, subsection_analysis_output = _refine_top_sections(
+            ranked_sections, refine, progress)
+
+    # --- 5. Final Output Generation ---
+    final_output = _build_output(labels, persona, job_to_be_done,
+                                 extracted_sections_output, subsection_analysis_output,
+                                 dict({"deduplication": dedup_stats, "running_lines_removed": running_removed},
+                                      **_deadline_metadata(deadline)))
+    
+    print("--- Analysis Complete ---")
+    return final_output
+
+def _extract_and_rank(documents: List[Document], persona: str, job_to_be_done: str,
+                      progress: Callable[..., None], profiler=NULL_PROFILER,
+                      deadline: Optional[Deadline] = None, labels: Optional[List[str]] = None):
+    """The sequential stages 1-3. Returns (ranked sections or None, dedup stats, running lines removed)."""
+    deadline = deadline or Deadline(None)
     # --- 1. Document Structuring ---
+    with profiler.stage("extraction"):
+        running_removed = {}
+        all_sections = _extract_sections(documents, progress, profiler, running_removed, deadline, labels)
+    if not all_sections:
+        print("Could not extract any sections from the documents. Aborting.")
+        return None, {}, running_removed
+
+    # --- 2. Near-duplicate Collapsing ---
+    with STAGE_SECONDS.time(stage="dedup"), profiler.stage("dedup"):
+        unique_sections, dedup_stats = deduplicate_sections(all_sections)
+
+    # --- 3. Relevance Ranking ---
+    progress("ranking", 0, len(unique_sections))
+    deadline.check(sections=len(unique_sections))
+    with STAGE_SECONDS.time(stage="ranking"), profiler.stage("ranking"):
+        if deadline.applies(KEYWORD_RANKING):
+            ranked_sections = _rank_by_keywords(persona, job_to_be_done, unique_sections)
+        else:
+            engine = RelevanceEngine()
+            ranked_sections = engine.rank_documents(persona, job_to_be_done, unique_sections)
+    SECTIONS_PROCESSED.inc(len(all_sections))
+    return ranked_sections, dedup_stats, running_removed
+
+def run_batch_analysis_pipeline(documents: List[Document], queries: List[Dict[str, str]],
+                                progress: Optional[Callable[..., None]] = None) -> List[Dict[str, Any]]:
+    """
+    Analyzes one document set for several persona/job queries at once. Each
+    query is a dict with 'persona' and 'job_to_be_done'. The documents are
+    extracted and their sections embedded once; all queries are encoded in a
+    single batch and scored with one similarity matrix. Returns one result per
+    query, in the same format and order as run_analysis_pipeline would.
+    """
+    if progress is None:
+        progress = _no_progress
+
+    with ANALYSES_IN_FLIGHT.track(), STAGE_SECONDS.time(stage="total"):
+        print(f"--- Starting Batch Analysis for {len(queries)} Queries ---")
+
+        # --- 1. Document Structuring (shared by every query) ---
+        running_removed = {}
+        all_sections = _extract_sections(documents, progress, running_removed=running_removed)
+        if not all_sections:
+            print("Could not extract any sections from the documents. Aborting.")
+            return [{} for _ in queries]
+
+        # --- 2. Near-duplicate Collapsing ---
+        with STAGE_SECONDS.time(stage="dedup"):
+            unique_sections, dedup_stats = deduplicate_sections(all_sections)
+
+        # --- 3. Relevance Ranking for all queries together ---
+        progress("ranking", 0, len(unique_sections))
+        with STAGE_SECONDS.time(stage="ranking"):
+            engine = RelevanceEngine()
+            rankings = engine.rank_documents_many(
+                [(q["persona"], q["job_to_be_done"]) for q in queries], unique_sections)
+        SECTIONS_PROCESSED.inc(len(all_sections))
+
+        # --- 4. Refinement; a section ranked highly by several queries is summarized once ---
+        refined_cache = {}
+        def refine_once(text):
+            if text not in refined_cache:
+                refined_cache[text] = refine_text(text)
+            return refined_cache[text]
+
+        results = []
+        with STAGE_SECONDS.time(stage="refinement"):
+            for query, ranked_sections in zip(queries, rankings):
+                extracted, subsections = _refine_top_sections(ranked_sections, refine_once, progress)
+                results.append(_build_output(_labels(documents), query["persona"], query["job_to_be_done"],
+                                             extracted, subsections,
+                                             {"deduplication": dedup_stats,
+                                              "running_lines_removed": running_removed}))
+
+        print("--- Batch Analysis Complete ---")
+        return results
+
+def _rank_by_keywords(persona: str, job_to_be_done: str, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ranks sections with TF-IDF instead of the encoder, in RelevanceEngine's output format."""
+    ranked = KeywordEngine().rank(RelevanceEngine.build_query(persona, job_to_be_done), [s.copy() for s in sections])
+    for i, section in enumerate(ranked, 1):
+        section['importance_rank'] = i
+    return ranked
+
+def _extract_sections(documents: List[Document], progress: Callable[..., None],
+                      profiler=NULL_PROFILER,
+                      running_removed: Optional[Dict[str, int]] = None,
+                      deadline: Optional[Deadline] = None,
+                      labels: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Parses every document and returns the sections of all of them, each
+    naming its document by its entry in `labels` (default: base names). If
+    given, `running_removed` is filled with the number of running header and
+    footer lines dropped from each document, and `deadline` may cap the pages
+    parsed.
+    """
+    deadline = deadline or Deadline(None)
+    labels = labels or _labels(documents)
     all_sections = []
-    for doc_path in doc_paths:
-        if not os.path.exists(doc_path):
-            print(f"Warning: Document not found at {doc_path}. Skipping.")
-            continue
-        
-        print(f"Parsing document: {doc_path}")
+    extraction_start = time.perf_counter()
+    for i, doc in enumerate(documents):
+        progress("extracting", i, len(documents))
+        deadline.check(documents_left=len(documents) - i)
+        doc_start = time.perf_counter()
+        sections, removed = _extract_document(doc, profiler, max_pages=deadline.max_pages, label=labels[i])
+        deadline.record_document(time.perf_counter() - doc_start, len(sections))
+        if removed is not None and running_removed is not None:
+            running_removed[labels[i]] = removed
+        all_sections.extend(sections)
+    STAGE_SECONDS.observe(time.perf_counter() - extraction_start, stage="extraction")
+    return all_sections
+
+def _extract_document(doc: Document, profiler=NULL_PROFILER, max_pages: Optional[int] = None,
+                      label: Optional[str] = None):
+    """
+    Parses one document into sections, or its first `max_pages` pages, naming
+    it `label` in them (default: its base name). Returns
+    (sections, running lines removed), with None for the count if the document
+    does not exist. A PDF that cannot be parsed raises, failing the analysis.
+    """
+    doc_name = _document_name(doc)
+    if isinstance(doc, str) and not os.path.exists(doc):
+        print(f"Warning: Document not found at {doc}. Skipping.")
+        return [], None
+
+    print(f"Parsing document: {doc_name}")
+    with profiler.document(doc_name):
         # Use your existing PDFExtractor to get the document's structure.
-        extractor = PDFExtractor(doc_path) 
-        title, headings = extractor.extract_structure()
-        
+        source = doc if isinstance(doc, str) else doc.source
+        size = os.path.getsize(doc) if isinstance(doc, str) else doc.size
+        # Hot documents stay parsed in the pool between uses. A spilled upload's
+        # file is deleted after the request, so its handle is not kept.
+        poolable = isinstance(doc, str) or doc.data is not None
+        with document_pool.lease(_content_hash(doc), lambda: PDFExtractor._open(source), size,
+                                 poolable) as pdf, \
+                PDFExtractor(source, name=doc_name, doc=pdf, max_pages=max_pages) as extractor:
+            title, headings = extractor.extract_structure()
+            DOCUMENTS_PROCESSED.inc()
+            PAGES_PROCESSED.inc(len(pdf) if max_pages is None else min(len(pdf), max_pages))
+        RUNNING_LINES_REMOVED.inc(extractor.stats["running_lines_removed"])
+
         # Convert the extracted headings into a list of structured sections.
         # This helper function can be improved to extract full paragraph text.
-        all_sections.extend(structure_content_from_headings(doc_path, headings))
-
-    if not all_sections:
-        print("Could not extract any sections from the documents. Aborting.")
-        return {}
+        sections = structure_content_from_headings(label or os.path.basename(doc_name), headings)
+    return sections, extractor.stats["running_lines_removed"]
 
-    # --- 2. Relevance Ranking ---
-    engine = RelevanceEngine()
-    ranked_sections = engine.rank_documents(persona, job_to_be_done, all_sections)
-    
-    # --- 3. Sub-section Analysis & Refinement ---
+def _refine_top_sections(ranked_sections: List[Dict[str, Any]], refine: Callable[[str], str],
+                         progress: Callable[..., None]):
+    """Builds the extracted-section and refined-text entries for the top sections."""
     extracted_sections_output = []
     subsection_analysis_output = []
     
-    top_n = min(5, len(ranked_sections))
+    top_n = min(TOP_N_SECTIONS, len(ranked_sections))
     print(f"Refining the top {top_n} most relevant sections...")
 
-    for section in ranked_sections[:top_n]:
+    for i, section in enumerate(ranked_sections[:top_n]):
+        progress("refining", i, top_n)
         extracted_sections_output.append({
-            "document": os.path.basename(section["document"]),
+            "document": section["document"],
             "page_number": section["page_number"],
             "section_title": section["section_title"],
-            "importance_rank": section["importance_rank"]
+            "importance_rank": section["importance_rank"],
+            # Where the same (or nearly the same) section also appears.
+            "also_found_in": [dict(source) for source in section.get("also_found_in", [])]
         })
 
         # Generate the 'Refined Text' for the sub-section analysis.
-        refined = refine_text(section["text"])
+        refined = refine(section["text"])
         
         subsection_analysis_output.append({
-            "document": os.path.basename(section["document"]),
+            "document": section["document"],
             "page_number": section["page_number"],
             "refined_text": refined
         })
 
-    # --- 4. Final Output Generation ---
-    final_output = {
-        "metadata": {
-            "input_documents": [os.path.basename(p) for p in doc_paths],
-            "persona": persona,
-            "job_to_be_done": job_to_be_done,
-            "processing_timestamp": datetime.datetime.now().isoformat()
-        },
+    return extracted_sections_output, subsection_analysis_output
+
+def _build_output(labels: List[str], persona: str, job_to_be_done: str,
+                  extracted_sections_output: List[Dict[str, Any]],
+                  subsection_analysis_output: List[Dict[str, Any]],
+                  extra_metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    metadata = {
+        "input_documents": list(labels),
+        "persona": persona,
+        "job_to_be_done": job_to_be_done,
+        "processing_timestamp": datetime.datetime.now().isoformat()
+    }
+    metadata.update(extra_metadata or {})
+    return {
+        "metadata": metadata,
         "extracted_section": extracted_sections_output,
         "sub-section_analysis": subsection_analysis_output
     }
-    
-    print("--- Analysis Complete ---")
-    return final_output
@@ -0,0 +1,209 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.models import model_load_times, process_memory
+
+# Default latency buckets in seconds, from fast cache hits to multi-minute analyses.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values]
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. Pass `callback` to compute the value(s) at
+    scrape time instead: it returns a number, or a dict of label tuple -> number.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Counts the wrapped block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        if self._callback is not None:
+            values = self._callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+                for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of observed values, e.g. latencies in seconds."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall time of the wrapped block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        lines = []
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- Pipeline metrics ---
+STAGE_SECONDS = registry.register(Histogram(
+    'pdf_pipeline_stage_seconds', 'Time spent in each analysis pipeline stage.', ['stage']))
+PAGES_PROCESSED = registry.register(Counter(
+    'pdf_pages_processed_total', 'PDF pages parsed by the analysis pipeline.'))
+SECTIONS_PROCESSED = registry.register(Counter(
+    'pdf_sections_processed_total', 'Document sections ranked by the analysis pipeline.'))
+DOCUMENTS_PROCESSED = registry.register(Counter(
+    'pdf_documents_processed_total', 'Documents parsed by the analysis pipeline.'))
+RUNNING_LINES_REMOVED = registry.register(Counter(
+    'pdf_running_lines_removed_total', 'Running header and footer lines dropped before heading classification.'))
+ANALYSES_IN_FLIGHT = registry.register(Gauge(
+    'pdf_analyses_in_flight', 'Analysis pipeline runs currently in progress.'))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    'pdf_http_requests_in_flight', 'HTTP requests currently being served, by endpoint.', ['endpoint']))
+CACHE_REQUESTS = registry.register(Counter(
+    'pdf_cache_requests_total', 'Cache lookups by cache and result (hit or miss).', ['cache', 'result']))
+
+# --- Job queue metrics ---
+JOB_QUEUE_DEPTH = registry.register(Gauge(
+    'pdf_job_queue_depth', 'Jobs waiting for a free worker.'))
+JOBS_RUNNING = registry.register(Gauge(
+    'pdf_jobs_running', 'Jobs currently being processed.'))
+
+# --- Process metrics, computed at scrape time ---
+MODEL_LOAD_SECONDS = registry.register(Gauge(
+    'pdf_model_load_seconds', 'Time it took to load each model in this process.', ['model'],
+    callback=lambda: {(name,): secs for name, secs in model_load_times().items()}))
+RESIDENT_MEMORY = registry.register(Gauge(
+    'process_resident_memory_bytes', 'Resident memory of this process.',
+    callback=lambda: process_memory().get('rss', 0)))
+PROPORTIONAL_MEMORY = registry.register(Gauge(
+    'pdf_process_pss_bytes', 'Proportional set size of this process (shared pages divided among their sharers).',
+    callback=lambda: process_memory().get('pss', 0)))
+PROCESS_ID = registry.register(Gauge(
+    'pdf_process_id', 'PID of the worker process that answered this scrape.',
+    callback=os.getpid))
@@ -0,0 +1,168 @@
+import functools
+import hashlib
+import importlib.metadata
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+
+# Default model locations and names used across the pipeline.
+HEADING_MODEL_PATH = 'src/heading_classifier.joblib'
+HEADING_CLASSES_PATH = 'src/heading_model_classes.joblib'
+SENTENCE_MODEL_NAME = os.environ.get('SENTENCE_MODEL', 'multi-qa-mpnet-base-dot-v1')
+# Cascade ranking: the small encoder scores every section and only the top
+# CASCADE_RERANK are re-encoded with SENTENCE_MODEL. 0 turns the cascade off.
+SMALL_SENTENCE_MODEL_NAME = os.environ.get('SMALL_SENTENCE_MODEL', 'multi-qa-MiniLM-L6-cos-v1')
+CASCADE_RERANK = int(os.environ.get('CASCADE_RERANK', 0))
+# The spaCy pipeline src/utils.py loads for summarization.
+SPACY_MODEL_NAME = 'en_core_web_sm'
+# Bump when the extraction, ranking or refinement logic changes the output,
+# so results cached by an older version are not served.
+PIPELINE_VERSION = "3"
+
+# Loaded models are cached per process, so every request, job and PDFExtractor
+# shares one copy. When they are loaded before the server forks, the workers
+# share those pages with the parent copy-on-write.
+_cache = {}
+_load_times = {}
+_lock = threading.Lock()
+# File digests by path, least recently used first; at most MAX_FILE_DIGESTS.
+_digests = OrderedDict()
+MAX_FILE_DIGESTS = 1024
+
+
+def _get_or_load(key, loader):
+    model = _cache.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        if key not in _cache:
+            start = time.perf_counter()
+            _cache[key] = loader()
+            _load_times[key] = time.perf_counter() - start
+        return _cache[key]
+
+
+def get_heading_model(model_path=HEADING_MODEL_PATH, classes_path=HEADING_CLASSES_PATH):
+    """Returns the (classifier, classes) pair of the heading model. Raises FileNotFoundError."""
+    return _get_or_load(('heading', model_path, classes_path),
+                        lambda: (joblib.load(model_path), joblib.load(classes_path)))
+
+
+def get_sentence_model(model_name=SENTENCE_MODEL_NAME):
+    """
+    Returns a SentenceTransformer, loading it on first use. `model_name` may be
+    a local model directory, which loads without network access.
+    """
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return _get_or_load(('sentence', model_name), load)
+
+
+def get_nlp():
+    """Returns the spaCy pipeline used for summarization."""
+    def load():
+        from src import utils
+        return utils.nlp
+    return _get_or_load(('spacy',), load)
+
+
+def preload_models():
+    """
+    Loads every model the pipeline needs. Call it in the parent process before
+    forking server workers. Returns the load time in seconds of each model.
+    """
+    print("Preloading models...")
+    get_heading_model()
+    get_sentence_model()
+    if CASCADE_RERANK:
+        get_sentence_model(SMALL_SENTENCE_MODEL_NAME)
+    get_nlp()
+    load_times = model_load_times()
+    print("Models preloaded: " + ", ".join(f"{name} {secs:.1f}s" for name, secs in load_times.items()))
+    return load_times
+
+
+def model_load_times():
+    """Returns the load time in seconds of each model loaded so far."""
+    return {_load_time_name(key): secs for key, secs in _load_times.items()}
+
+
+def _load_time_name(key):
+    # The cascade's small encoder is reported separately from the main one.
+    if key[0] == 'sentence' and key[1] != SENTENCE_MODEL_NAME:
+        return 'sentence_small'
+    return key[0]
+
+
+def file_digest(path):
+    """Returns the SHA-256 of a file, cached until its size or mtime changes."""
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        cached = _digests.get(path)
+        if cached is not None and cached[0] == version:
+            _digests.move_to_end(path)
+            return cached[1]
+
+    # Hashed outside the lock, so a large file does not hold up model lookups.
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    with _lock:
+        _digests[path] = (version, digest.hexdigest())
+        _digests.move_to_end(path)
+        while len(_digests) > MAX_FILE_DIGESTS:
+            _digests.popitem(last=False)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _package_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def model_versions():
+    """
+    Identifies the models and pipeline version that produce an analysis,
+    for keying cached results. Loads no model: the spaCy pipeline is
+    identified by its installed package version, looked up once.
+    """
+    return {
+        "pipeline": PIPELINE_VERSION,
+        "heading_model": file_digest(HEADING_MODEL_PATH) if os.path.exists(HEADING_MODEL_PATH) else None,
+        "sentence_model": SENTENCE_MODEL_NAME,
+        "cascade": f"{SMALL_SENTENCE_MODEL_NAME}@{CASCADE_RERANK}" if CASCADE_RERANK else None,
+        "spacy_model": f"{SPACY_MODEL_NAME}-{_package_version(SPACY_MODEL_NAME)}",
+    }
+
+
+def process_memory():
+    """
+    Returns this process's memory split from /proc/self/smaps_rollup, in bytes:
+    'rss', 'pss' (shared pages divided among their sharers), 'shared' and 'private'.
+    Returns an empty dict where smaps_rollup is unavailable.
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return {}
+
+    return {
+        "rss": fields.get('Rss', 0),
+        "pss": fields.get('Pss', 0),
+        "shared": fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        "private": fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
@@ -1,63 +1,91 @@
 import fitz  # PyMuPDF
-import joblib
 import os
 import numpy as np
 
+from src.feature_store import extract_line_features
+from src.running_lines import find_running_lines
+from src.models import get_heading_model, HEADING_MODEL_PATH, HEADING_CLASSES_PATH
+from src.batching import batched_predictor
+
 class PDFExtractor:
     """
     Extracts document structure using a pre-trained, multi-class
     machine learning model to classify text lines as Title, H1, H2, etc.
     """
 
-    def __init__(self, pdf_path, model_path='src/heading_classifier.joblib', classes_path='src/heading_model_classes.joblib'):
-        self.pdf_path = pdf_path
-        self.doc = None
+    def __init__(self, source, model_path=HEADING_MODEL_PATH, classes_path=HEADING_CLASSES_PATH, name=None,
+                 suppress_running=True, doc=None, max_pages=None):
+        """
+        `source` may be a file path, the PDF's bytes, or a binary stream.
+        `name` labels in-memory sources in messages and defaults to the path.
+        With `suppress_running`, page headers, footers and page numbers are
+        dropped before classification. With `max_pages`, only the first
+        max_pages pages are parsed.
+
+        Pass an already open fitz `doc` (e.g. leased from the DocumentPool) to
+        skip opening `source`; the extractor then leaves closing it to the owner.
+        Otherwise the extractor owns its document: use it as a context manager
+        or call close() when done.
+        """
+        self.pdf_path = source if isinstance(source, str) else None
+        self.name = name or self.pdf_path or "<memory>"
+        self.suppress_running = suppress_running
+        self.max_pages = max_pages
+        self.doc = doc
+        self._owns_doc = doc is None
         self.model = None
         self.model_classes = None
+        # Filled in by extract_structure.
+        self.stats = {"lines": 0, "running_lines_removed": 0}
 
-        if not os.path.exists(pdf_path):
-            print(f"Error: The file '{pdf_path}' was not found.")
-            return
-        
-        try:
-            self.doc = fitz.open(pdf_path)
-        except Exception as e:
-            print(f"Error opening or processing PDF {pdf_path}: {e}")
-            self.doc = None
-            return
+        if self.doc is None:
+            if self.pdf_path is not None and not os.path.exists(self.pdf_path):
+                print(f"Error: The file '{self.pdf_path}' was not found.")
+                return
+
+            try:
+                self.doc = self._open(source)
+            except Exception as e:
+                print(f"Error opening or processing PDF {self.name}: {e}")
+                self.doc = None
+                return
 
         try:
-            self.model = joblib.load(model_path)
-            self.model_classes = joblib.load(classes_path)
+            # The classifier is loaded once per process and shared by all extractors.
+            self.model, self.model_classes = get_heading_model(model_path, classes_path)
+            # With MICRO_BATCHING, predictions of concurrent extractors share one call.
+            self.model = batched_predictor(self.model)
         except FileNotFoundError:
             print(f"Error: Model file not found at '{model_path}' or '{classes_path}'.")
             return
 
+    def close(self):
+        """Closes the document if this extractor opened it. Safe to call more than once."""
+        if self.doc is not None and self._owns_doc:
+            self.doc.close()
+        self.doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _open(source):
+        """Opens a path with fitz directly and in-memory content as a stream."""
+        if isinstance(source, str):
+            return fitz.open(source)
+        if hasattr(source, 'read'):
+            source = source.read()
+        return fitz.open(stream=source, filetype="pdf")
+
     def _extract_features(self, page, line):
         """
-        Extracts numerical features from a line of text for prediction.
-        NOW INCLUDES 'is_centered'.
+        Extracts numerical features from a line of text for prediction. Shares
+        the feature code with training so the two can never drift apart.
         """
-        if not line['spans']:
-            return None
-
-        span = line['spans'][0]
-        
-        # CORRECTED: This now extracts all 6 features to match the model
-        font_size = round(span['size'])
-        is_bold = 1 if "bold" in span['font'].lower() else 0
-        y_position = line['bbox'][1] / page.rect.height if page.rect.height > 0 else 0
-        word_count = len(" ".join(s['text'] for s in line['spans']).strip().split())
-        is_all_caps = 1 if " ".join(s['text'] for s in line['spans']).strip().isupper() and len(" ".join(s['text'] for s in line['spans']).strip()) > 3 else 0
-
-        # --- NEW FEATURE: is_centered ---
-        page_width = page.rect.width
-        line_center = (line['bbox'][0] + line['bbox'][2]) / 2
-        page_center = page_width / 2
-        tolerance = page_width * 0.05
-        is_centered = 1 if abs(line_center - page_center) < tolerance else 0
-        
-        return [font_size, is_bold, y_position, word_count, is_all_caps, is_centered]
+        return extract_line_features(page, line)
 
     def extract_structure(self):
         """
@@ -66,28 +94,57 @@ class PDFExtractor:
         if not self.doc or self.model is None:
             return "No Title Found", []
 
-        headings = []
-        all_lines_features = []
-        line_references = []
-        
-        for pnum, page in enumerate(self.doc):
+        lines = []
+        num_pages = len(self.doc) if self.max_pages is None else min(len(self.doc), self.max_pages)
+        for pnum in range(num_pages):
+            page = self.doc[pnum]
             blocks = page.get_text("dict")["blocks"]
             for block in blocks:
                 if block['type'] == 0:
                     for line in block['lines']:
-                        features = self._extract_features(page, line)
-                        if features:
-                            all_lines_features.append(features)
-                            line_references.append({
-                                'text': " ".join(s['text'] for s in line['spans']).strip(),
-                                'page': pnum + 1
-                            })
+                        if line['spans']:
+                            lines.append((pnum, page, line))
+
+        # Drop running headers and footers before any features are computed.
+        running = self._find_running(lines, num_pages) if self.suppress_running else np.zeros(len(lines), dtype=bool)
+        self.stats = {"lines": len(lines), "running_lines_removed": int(running.sum())}
+        if self.stats["running_lines_removed"]:
+            print(f"  - Removed {self.stats['running_lines_removed']} running header/footer lines from {self.name}")
+
+        all_lines_features = []
+        line_references = []
+        for (pnum, page, line), is_running in zip(lines, running):
+            if is_running:
+                continue
+            features = self._extract_features(page, line)
+            if features:
+                all_lines_features.append(features)
+                line_references.append({
+                    'text': " ".join(s['text'] for s in line['spans']).strip(),
+                    'page': pnum + 1
+                })
         
         if not all_lines_features:
             return "No Title Found", []
 
         predicted_class_names = self.model.predict(np.array(all_lines_features))
-        
+        return self.structure_from_predictions(predicted_class_names, line_references)
+
+    def _find_running(self, lines, num_pages):
+        """Flags the (page index, page, line) entries that are running headers or footers."""
+        texts = [" ".join(s['text'] for s in line['spans']).strip() for _, _, line in lines]
+        pages = [pnum for pnum, _, _ in lines]
+        y_positions = [((line['bbox'][1] + line['bbox'][3]) / 2) / page.rect.height if page.rect.height > 0 else 0.5
+                       for _, page, line in lines]
+        return find_running_lines(texts, pages, y_positions, num_pages)
+
+    @staticmethod
+    def structure_from_predictions(predicted_class_names, line_references):
+        """
+        Builds the (title, headings) outline from per-line class predictions and
+        the matching {'text', 'page'} line references.
+        """
+        headings = []
         title = "No Title Found"
         found_title = False
         for i, class_name in enumerate(predicted_class_names):
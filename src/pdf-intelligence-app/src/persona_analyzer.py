@@ -1,10 +1,12 @@
 import os
 import fitz  # PyMuPDF
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from src.models import get_sentence_model, SENTENCE_MODEL_NAME, CASCADE_RERANK
+from src.batching import batched_encoder
 
 # --- PDF Processing Utility ---
 # This function extracts the full text from a PDF file.
@@ -29,32 +31,53 @@ class SemanticEngine:
     """
     Ranks documents based on semantic meaning using a powerful transformer model.
     """
-    def __init__(self, model_name: str = 'multi-qa-mpnet-base-dot-v1'):
+    def __init__(self, model_name: str = SENTENCE_MODEL_NAME):
         """
         Initializes the engine and loads a sentence-transformer model optimized
         for semantic search and question answering.
         """
         print("Initializing Semantic Engine...")
-        self.model = SentenceTransformer(model_name)
+        # Shared per process, so creating an engine per request does not reload the weights.
+        self.model = batched_encoder(get_sentence_model(model_name))
         print("Semantic Engine initialized successfully.")
 
     def rank(self, query: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Ranks documents by their semantic relevance to the query.
         """
+        return self.rank_many([query], documents)[0]
+
+    def encode_documents(self, documents: List[Dict[str, Any]]) -> np.ndarray:
+        """Embeds the 'text' of each document; one row per document."""
+        return self.model.encode([doc.get('text', '') for doc in documents])
+
+    def rank_many(self, queries: List[str], documents: List[Dict[str, Any]],
+                  doc_embeddings: Optional[np.ndarray] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Ranks the same documents against several queries. The documents are
+        encoded once, all queries are encoded in one batch, and every score comes
+        from a single similarity matrix. Returns one ranked copy of the documents
+        per query. Pass `doc_embeddings` if the documents were already encoded.
+        """
         # This is the core of the semantic search. The model converts text into
         # vectors that represent its meaning.
-        query_embedding = self.model.encode([query])
-        doc_texts = [doc.get('text', '') for doc in documents]
-        doc_embeddings = self.model.encode(doc_texts)
+        query_embeddings = self.model.encode(queries)
+        if doc_embeddings is None:
+            doc_embeddings = self.encode_documents(documents)
         
         # Cosine similarity measures how similar the query's meaning is to each document's meaning.
-        similarities = cosine_similarity(query_embedding, doc_embeddings)[0]
-
-        for i, doc in enumerate(documents):
-            doc['relevance_score'] = round(float(similarities[i]), 4)
-        
-        return sorted(documents, key=lambda x: x['relevance_score'], reverse=True)
+        # Rows are queries, columns are documents.
+        similarities = cosine_similarity(query_embeddings, doc_embeddings)
+
+        rankings = []
+        for row in similarities:
+            scored = []
+            for doc, score in zip(documents, row):
+                doc = doc.copy() if len(queries) > 1 else doc
+                doc['relevance_score'] = round(float(score), 4)
+                scored.append(doc)
+            rankings.append(sorted(scored, key=lambda x: x['relevance_score'], reverse=True))
+        return rankings
 
 # --- Engine 2: Classic Keyword Relevance Engine ---
 # This engine ranks documents based on matching keywords (TF-IDF).
@@ -145,16 +168,34 @@ if __name__ == "__main__":
         analyze_and_rank_pdfs(PDF_INPUT_DIRECTORY, USER_PERSONA, JOB_TO_BE_DONE)
 class RelevanceEngine:
     """
-    Wrapper that uses SemanticEngine to rank document sections.
+    Wrapper that uses SemanticEngine to rank document sections, or a
+    CascadeEngine when CASCADE_RERANK is set.
     """
     def __init__(self):
-        self.semantic_engine = SemanticEngine()
+        if CASCADE_RERANK:
+            from src.cascade import CascadeEngine
+            self.semantic_engine = CascadeEngine()
+        else:
+            self.semantic_engine = SemanticEngine()
+
+    @staticmethod
+    def build_query(persona, job_to_be_done):
+        return f"As a {persona}, my goal is to {job_to_be_done}."
 
-    def rank_documents(self, persona, job_to_be_done, sections):
-        query = f"As a {persona}, my goal is to {job_to_be_done}."
+    def rank_documents(self, persona, job_to_be_done, sections, embeddings=None):
+        return self.rank_documents_many([(persona, job_to_be_done)], sections, embeddings)[0]
+
+    def rank_documents_many(self, persona_jobs, sections, embeddings=None):
+        """
+        Ranks the sections for several (persona, job_to_be_done) pairs, encoding
+        the sections only once (or not at all when their `embeddings` are given).
+        Returns one ranked list per pair.
+        """
+        queries = [self.build_query(persona, job) for persona, job in persona_jobs]
         # Each section should have a 'text' field
-        ranked = self.semantic_engine.rank(query, [s.copy() for s in sections])
+        rankings = self.semantic_engine.rank_many(queries, [s.copy() for s in sections], embeddings)
         # Add importance_rank for output
-        for i, sec in enumerate(ranked, 1):
-            sec['importance_rank'] = i
-        return ranked
\ No newline at end of file
+        for ranked in rankings:
+            for i, sec in enumerate(ranked, 1):
+                sec['importance_rank'] = i
+        return rankings
\ No newline at end of file
@@ -0,0 +1,163 @@
+import cProfile
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+# tracemalloc's tracing state and peak are process-wide, so only one profiled
+# run at a time: held from start() to stop().
+_run_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised by Profiler.start() while another profiled run is in progress in this process."""
+
+
+class NullProfiler:
+    """Stands in for Profiler when profiling is off; every hook is a no-op."""
+    enabled = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stage(self, name):
+        return _NULL
+
+    def document(self, name):
+        return _NULL
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """
+    Records wall and CPU time per pipeline stage and per document, and the peak
+    Python allocation seen by tracemalloc while it runs. If `cprofile_path` is
+    set, the `hot_stage` is also run under cProfile and its stats are dumped
+    there for `python -m pstats` or snakeviz.
+
+    CPU time is process-wide, so it includes worker threads started by numpy or
+    torch, and tracemalloc only sees allocations made through Python's allocator.
+    Only one Profiler runs at a time per process, so peaks and timings of
+    concurrent runs never mix: start() raises ProfilerBusy instead of waiting,
+    so a rejected run is not slowed down by the one in progress.
+    """
+    enabled = True
+
+    def __init__(self, hot_stage="extraction", cprofile_path=None, top_n=5):
+        self.hot_stage = hot_stage
+        self.cprofile_path = cprofile_path
+        self.top_n = top_n
+        self.stages = {}
+        self.documents = []
+        self._cprofile = cProfile.Profile() if cprofile_path else None
+        self._owns_tracemalloc = False
+        self._running = False
+        self._wall_start = None
+        self._cpu_start = None
+        self._wall_seconds = 0.0
+        self._cpu_seconds = 0.0
+        self._peak_bytes = 0
+
+    def start(self):
+        if not _run_lock.acquire(blocking=False):
+            raise ProfilerBusy("Another profiled run is in progress in this process; try again when it ends.")
+        self._running = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def stop(self):
+        if not self._running:
+            return
+        try:
+            self._wall_seconds = time.perf_counter() - self._wall_start
+            self._cpu_seconds = time.process_time() - self._cpu_start
+            self._peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+            if self._cprofile is not None:
+                self._cprofile.dump_stats(self.cprofile_path)
+        finally:
+            self._running = False
+            _run_lock.release()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the wrapped block as (part of) stage `name`."""
+        profile = self._cprofile if name == self.hot_stage else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            totals = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+            totals["wall_seconds"] += time.perf_counter() - wall
+            totals["cpu_seconds"] += time.process_time() - cpu
+            totals["calls"] += 1
+
+    @contextmanager
+    def document(self, name):
+        """Times the wrapped block as the processing of document `name`."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.documents.append({
+                "document": name,
+                "wall_seconds": time.perf_counter() - wall,
+                "cpu_seconds": time.process_time() - cpu,
+            })
+
+    def report(self):
+        """Returns the measurements as a JSON-serializable dict."""
+        slowest = sorted(self.documents, key=lambda d: d["wall_seconds"], reverse=True)
+        return {
+            "total": {"wall_seconds": self._wall_seconds, "cpu_seconds": self._cpu_seconds},
+            "stages": self.stages,
+            "documents": self.documents,
+            "slowest_documents": slowest[:self.top_n],
+            "tracemalloc_peak_bytes": self._peak_bytes,
+            "cprofile_dump": self.cprofile_path,
+        }
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=4)
+
+    def print_summary(self):
+        report = self.report()
+        print(f"\nProfile: {report['total']['wall_seconds']:.2f}s wall, "
+              f"{report['total']['cpu_seconds']:.2f}s CPU, "
+              f"peak Python allocation {report['tracemalloc_peak_bytes'] / 1e6:.1f} MB")
+        for name, totals in report["stages"].items():
+            print(f"  - {name}: {totals['wall_seconds']:.2f}s wall, {totals['cpu_seconds']:.2f}s CPU")
+        if report["slowest_documents"]:
+            print("Slowest documents:")
+            for d in report["slowest_documents"]:
+                print(f"  - {d['document']}: {d['wall_seconds']:.2f}s")
+        if self.cprofile_path:
+            print(f"cProfile stats for '{self.hot_stage}' saved to '{self.cprofile_path}'.")
+
+
+@contextmanager
+def profiling(profiler):
+    """Runs the wrapped block between profiler.start() and profiler.stop()."""
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
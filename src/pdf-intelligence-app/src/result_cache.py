@@ -0,0 +1,93 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(content_hashes, persona, job_to_be_done, versions):
+    """
+    Builds a cache key from the inputs' content hashes (order-independent), the
+    persona and job strings, and the versions of the models and configuration.
+    """
+    payload = json.dumps({
+        "documents": sorted(content_hashes),
+        "persona": persona,
+        "job_to_be_done": job_to_be_done,
+        "versions": versions,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    An in-process LRU cache of whole analysis results. Entries expire after
+    `ttl_seconds`, and the least recently used ones are evicted once either
+    `max_entries` or `max_bytes` (the results' JSON size) is exceeded.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # key -> (stored_at, size, result)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns a copy of the cached result, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def put(self, key, result):
+        size = len(json.dumps(result))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time(), size, copy.deepcopy(result))
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove(self, key):
+        # Callers hold self._lock.
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+
+# Shared by every request and job in this process.
+result_cache = ResultCache(
+    ttl_seconds=int(os.environ.get('RESULT_CACHE_TTL', 3600)),
+    max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+)
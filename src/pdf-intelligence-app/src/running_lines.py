@@ -0,0 +1,64 @@
+import re
+
+import numpy as np
+
+# A line is "running" (a page header, footer or page number) when the same
+# normalized text sits at the same height on at least RUNNING_MIN_PAGES pages
+# and on at least RUNNING_PAGE_RATIO of all pages.
+RUNNING_MIN_PAGES = 3
+RUNNING_PAGE_RATIO = 0.5
+# Only lines in the top or bottom margin of a page, as a fraction of its height,
+# are considered, so repeated body text such as form labels is never dropped.
+RUNNING_MARGIN = 0.15
+# Heights (as a fraction of page height) within this distance count as the same band.
+RUNNING_Y_TOLERANCE = 0.01
+
+
+def normalize_running_text(text):
+    """Lowercases and collapses whitespace; every run of digits becomes '#', so 'Page 3 of 10' matches 'Page 4 of 10'."""
+    return re.sub(r'\d+', '#', " ".join(text.lower().split()))
+
+
+def find_running_lines(texts, pages, y_positions, num_pages):
+    """
+    Flags running lines. `texts` are the raw line texts, `pages` their page
+    indices and `y_positions` their vertical centres as a fraction of page
+    height. Returns a boolean array, True for lines to drop.
+
+    Lines are grouped by a hash of their normalized text, sorted by height
+    within each group, and split into bands wherever the height jumps by more
+    than RUNNING_Y_TOLERANCE. A band that recurs on enough distinct pages is
+    running.
+    """
+    n = len(texts)
+    running = np.zeros(n, dtype=bool)
+    min_pages = max(RUNNING_MIN_PAGES, int(np.ceil(RUNNING_PAGE_RATIO * num_pages)))
+    if n == 0 or num_pages < min_pages:
+        return running
+
+    y = np.asarray(y_positions, dtype=np.float64)
+    pages = np.asarray(pages, dtype=np.int64)
+    in_margin = (y <= RUNNING_MARGIN) | (y >= 1 - RUNNING_MARGIN)
+    candidates = np.flatnonzero(in_margin)
+    if candidates.size == 0:
+        return running
+
+    ids = {}
+    text_ids = np.array([ids.setdefault(normalize_running_text(texts[i]), len(ids)) for i in candidates])
+    y = y[candidates]
+    pages = pages[candidates]
+
+    # Sort by text, then height, and start a new band at every text change or height jump.
+    order = np.lexsort((y, text_ids))
+    text_sorted, y_sorted = text_ids[order], y[order]
+    new_band = np.ones(order.size, dtype=bool)
+    new_band[1:] = (text_sorted[1:] != text_sorted[:-1]) | (np.diff(y_sorted) > RUNNING_Y_TOLERANCE)
+    band_sorted = np.cumsum(new_band) - 1
+    bands = np.empty_like(band_sorted)
+    bands[order] = band_sorted
+
+    # Count the distinct pages each band appears on.
+    band_pages = np.unique(np.stack([bands, pages], axis=1), axis=0)
+    page_counts = np.bincount(band_pages[:, 0], minlength=band_sorted[-1] + 1)
+    running[candidates] = page_counts[bands] >= min_pages
+    return running
@@ -1,45 +1,29 @@
+import argparse
 import os
 import json
+import tempfile
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
 from sklearn.metrics import classification_report, accuracy_score
 import joblib
-import fitz  # PyMuPDF
+import time
 
-def _extract_features(page, line):
-    """
-    Extracts numerical features from a line of text.
-    NOW INCLUDES an 'is_centered' feature.
-    """
-    if not line['spans']:
-        return None
-
-    span = line['spans'][0]
-    text = " ".join(s['text'] for s in line['spans']).strip()
-
-    # --- Feature Engineering ---
-    font_size = round(span['size'])
-    is_bold = 1 if "bold" in span['font'].lower() else 0
-    y_position = line['bbox'][1] / page.rect.height if page.rect.height > 0 else 0
-    word_count = len(text.split())
-    is_all_caps = 1 if text.isupper() and len(text) > 3 else 0
+from src.feature_store import FeatureStore, FEATURE_COLUMNS, FEATURE_VERSION, INTEGER_FEATURE_COLUMNS
 
-    # --- NEW FEATURE: is_centered ---
-    # Calculates if the line is horizontally centered on the page.
-    page_width = page.rect.width
-    line_center = (line['bbox'][0] + line['bbox'][2]) / 2
-    page_center = page_width / 2
-    # Consider it centered if it's within 5% of the page's center
-    tolerance = page_width * 0.05
-    is_centered = 1 if abs(line_center - page_center) < tolerance else 0
-
-    return [font_size, is_bold, y_position, word_count, is_all_caps, is_centered]
-
-def create_dataset_from_files(file_mapping, input_dir='.'):
+def create_dataset_from_files(file_mapping, input_dir='.', store=None, n_jobs=-1):
     """
     Creates a multi-class dataset by parsing PDFs and using JSON files for labels.
+    Line features come from the feature store, so only PDFs that changed since
+    the last run are parsed again, in parallel across `n_jobs` processes.
+    Running headers and footers are left out, because PDFExtractor drops them
+    before classifying lines.
     """
     print(f"Searching for input files in the following directory: '{os.path.abspath(input_dir)}'")
     print("Creating multi-class dataset from provided files...")
@@ -48,6 +32,7 @@ def create_dataset_from_files(file_mapping, input_dir='.'):
     all_features = []
     all_labels = []
 
+    pairs = []
     for pdf_filename, json_filename in file_mapping.items():
         pdf_path = os.path.join(input_dir, pdf_filename)
         json_path = os.path.join(input_dir, json_filename)
@@ -55,41 +40,112 @@ def create_dataset_from_files(file_mapping, input_dir='.'):
         if not os.path.exists(pdf_path) or not os.path.exists(json_path):
             print(f"  - ERROR: File not found at '{os.path.abspath(pdf_path)}' or '{os.path.abspath(json_path)}'. Skipping.")
             continue
-        
-        print(f"  - Processing: {pdf_filename}")
+        pairs.append((pdf_filename, pdf_path, json_path))
+
+    store = store or FeatureStore()
+    start = time.perf_counter()
+    columns = store.load_many([pdf_path for _, pdf_path, _ in pairs], n_jobs=n_jobs)
+    print(f"  - Loaded features for {len(pairs)} PDFs in {time.perf_counter() - start:.2f}s")
+
+    # Labels are applied after loading, so a label change never re-parses a PDF.
+    running_skipped = 0
+    for (pdf_filename, _, json_path), doc_columns in zip(pairs, columns):
+        print(f"  - Labelling: {pdf_filename}")
         with open(json_path, 'r', encoding='utf-8') as f:
             ground_truth = json.load(f)
 
         true_headings = {item['text'].strip(): item['level'] for item in ground_truth.get('outline', [])}
         if ground_truth.get('title'):
             true_headings[ground_truth['title'].strip()] = 'Title'
-        
-        try:
-            doc = fitz.open(pdf_path)
-        except Exception as e:
-            print(f"  - Error opening {pdf_filename}: {e}")
-            continue
 
-        for pnum, page in enumerate(doc):
-            blocks = page.get_text("dict")["blocks"]
-            for block in blocks:
-                if block['type'] == 0:
-                    for line in block['lines']:
-                        features = _extract_features(page, line)
-                        if features:
-                            text = " ".join(s['text'] for s in line['spans']).strip()
-                            label = true_headings.get(text, 'Body_Text')
-                            all_features.append(features)
-                            all_labels.append(label)
-                            dataset_for_csv.append([text] + features + [label])
-        doc.close()
-
-    print(f"Dataset creation complete. Found {len(all_features)} total text lines.")
+        for features, text, running in zip(doc_columns['features'].tolist(), doc_columns['text'].tolist(),
+                                           doc_columns['running'].tolist()):
+            if running:
+                running_skipped += 1
+                continue
+            label = true_headings.get(text, 'Body_Text')
+            all_features.append(features)
+            all_labels.append(label)
+            dataset_for_csv.append([text] + features + [label])
+
+    print(f"Dataset creation complete. Found {len(all_features)} total text lines "
+          f"({running_skipped} running header and footer lines left out).")
     return np.array(all_features), np.array(all_labels), dataset_for_csv
 
-def train_and_save_model():
+def candidate_models():
+    """
+    Heading classifiers to compare in budgeted training, from the original
+    100-tree forest down to much lighter families. Returns (name, estimator) pairs.
+    """
+    candidates = []
+    for n_estimators in (100, 50, 25, 10):
+        for max_depth in (None, 12, 8):
+            candidates.append((f"random_forest(n={n_estimators}, depth={max_depth})",
+                               RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                                      random_state=42, class_weight='balanced')))
+    for n_estimators, max_depth in ((50, None), (25, 12)):
+        candidates.append((f"extra_trees(n={n_estimators}, depth={max_depth})",
+                           ExtraTreesClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                                random_state=42, class_weight='balanced')))
+    for max_depth in (None, 12, 8):
+        candidates.append((f"decision_tree(depth={max_depth})",
+                           DecisionTreeClassifier(max_depth=max_depth, random_state=42, class_weight='balanced')))
+    candidates.append(("hist_gradient_boosting",
+                       HistGradientBoostingClassifier(random_state=42, class_weight='balanced')))
+    candidates.append(("logistic_regression",
+                       make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000, class_weight='balanced'))))
+    return candidates
+
+def measure_model(model, X_eval, y_eval, repeats=5):
+    """
+    Measures a fitted model: accuracy on (X_eval, y_eval), per-line inference
+    latency, size on disk and load time. PDFExtractor predicts all lines of a
+    document in one call, so latency is the best batch time over `repeats`
+    divided by the lines.
+    """
+    accuracy = accuracy_score(y_eval, model.predict(X_eval))
+
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(X_eval)
+        best = min(best, time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.joblib')
+        joblib.dump(model, path)
+        size_kb = os.path.getsize(path) / 1024
+        start = time.perf_counter()
+        joblib.load(path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "accuracy": round(accuracy, 4),
+        "latency_us_per_line": round(best / len(X_eval) * 1e6, 3),
+        "size_kb": round(size_kb, 1),
+        "load_ms": round(load_ms, 2),
+    }
+
+def select_model(results, max_latency_us=None, max_size_kb=None):
+    """
+    Returns the result with the best validation accuracy within both budgets,
+    preferring the faster model on ties, or None when no candidate fits.
+    """
+    within = [r for r in results
+              if (max_latency_us is None or r["latency_us_per_line"] <= max_latency_us)
+              and (max_size_kb is None or r["size_kb"] <= max_size_kb)]
+    if not within:
+        return None
+    return max(within, key=lambda r: (r["validation_accuracy"], -r["latency_us_per_line"], -r["size_kb"]))
+
+def train_and_save_model(max_latency_us=None, max_size_kb=None):
     """
     Main function to create dataset, train classifier, and save it.
+    Without a budget it trains the default 100-tree forest. With one, it trains
+    every candidate_models() entry and saves the most accurate one that fits.
+    Candidates are compared on a validation split carved out of the training
+    data; the chosen one is then refitted on all training data and scored on
+    a test split that played no part in the choice.
     """
     file_mapping = {
         "Dinner Ideas - Sides_1.pdf": "Dinner Ideas - Sides_1.json",
@@ -106,8 +162,10 @@ def train_and_save_model():
         return
 
     # UPDATED columns to include the new feature
-    csv_columns = ['text', 'font_size', 'is_bold', 'y_position', 'word_count', 'is_all_caps', 'is_centered', 'label']
+    csv_columns = ['text'] + FEATURE_COLUMNS + ['label']
     df = pd.DataFrame(csv_data, columns=csv_columns)
+    # The store returns float64 features; write whole-number ones as integers.
+    df = df.astype({column: 'int64' for column in INTEGER_FEATURE_COLUMNS})
 
     output_dir = 'output'
     if not os.path.exists(output_dir):
@@ -120,17 +178,55 @@ def train_and_save_model():
     X_train, X_test, y_train, y_test = train_test_split(
         features, labels, test_size=0.25, random_state=42, stratify=labels
     )
-    print(f"\nDataset split into {len(X_train)} training samples and {len(X_test)} testing samples.")
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=42, stratify=y_train
+    )
+    print(f"\nDataset split into {len(X_train)} training samples ({len(X_val)} of them held out for "
+          f"validation) and {len(X_test)} testing samples.")
 
-    print("\nStarting model training with RandomForestClassifier...")
-    model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
-    model.fit(X_train, y_train)
+    budgeted = max_latency_us is not None or max_size_kb is not None
+    if budgeted:
+        candidates = candidate_models()
+        print(f"\nSearching {len(candidates)} candidates within a budget of "
+              f"{max_latency_us} us/line and {max_size_kb} KB...")
+    else:
+        candidates = [("random_forest(n=100, depth=None)",
+                       RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced'))]
+        print("\nStarting model training with RandomForestClassifier...")
+
+    results = []
+    for name, candidate in candidates:
+        start = time.perf_counter()
+        candidate.fit(X_fit, y_fit)
+        result = {"name": name, "train_seconds": round(time.perf_counter() - start, 2)}
+        result.update(measure_model(candidate, X_val, y_val))
+        result["validation_accuracy"] = result.pop("accuracy")
+        result["model"] = candidate
+        results.append(result)
+        print(f"  - {name:<36} validation accuracy {result['validation_accuracy']:.2%}  "
+              f"{result['latency_us_per_line']:>8.2f} us/line  {result['size_kb']:>9.1f} KB  "
+              f"load {result['load_ms']:>7.2f} ms")
     print("Model training complete.")
 
-    print("\nEvaluating model performance...")
+    chosen = select_model(results, max_latency_us, max_size_kb)
+    if chosen is None:
+        print("\nNo candidate fits the budget. The existing model was left unchanged.")
+        return
+    print(f"\nSelected: {chosen['name']}")
+
+    # The chosen configuration is refitted on all training data; only the test
+    # split, unseen during selection, measures the saved model.
+    model = clone(chosen["model"])
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    final = {"name": chosen["name"], "train_seconds": round(time.perf_counter() - start, 2),
+             "validation_accuracy": chosen["validation_accuracy"]}
+    final.update(measure_model(model, X_test, y_test))
+    final["test_accuracy"] = final.pop("accuracy")
+
+    print("\nEvaluating model performance on the held-out test split...")
     predictions = model.predict(X_test)
-    accuracy = accuracy_score(y_test, predictions)
-    print(f"Overall Accuracy: {accuracy:.2%}")
+    print(f"Overall Accuracy: {final['test_accuracy']:.2%}")
     print("\nClassification Report:")
     class_names = sorted(list(set(y_train) | set(y_test)))
     print(classification_report(y_test, predictions, labels=class_names, zero_division=0))
@@ -142,7 +238,28 @@ def train_and_save_model():
     model_filename = os.path.join(src_dir, 'heading_classifier.joblib')
     joblib.dump(model, model_filename)
     joblib.dump(model.classes_, os.path.join(src_dir, 'heading_model_classes.joblib'))
+
+    # Record how the saved model was chosen and what it costs, next to the model.
+    metadata = {
+        "model": final,
+        "budget": {"max_latency_us_per_line": max_latency_us, "max_size_kb": max_size_kb},
+        "candidates": [{k: v for k, v in r.items() if k != "model"} for r in results],
+        "feature_version": FEATURE_VERSION,
+        "feature_columns": FEATURE_COLUMNS,
+        "train_samples": len(X_train),
+        "validation_samples": len(X_val),
+        "test_samples": len(X_test),
+    }
+    with open(os.path.join(src_dir, 'heading_model_meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=4)
     print(f"\nModel and class names successfully saved to the '{src_dir}' directory.")
 
 if __name__ == "__main__":
-    train_and_save_model()
\ No newline at end of file
+    # Run from the app directory: python -m src.train_model [--max-latency-us N] [--max-size-kb N]
+    parser = argparse.ArgumentParser(description="Train the heading classifier.")
+    parser.add_argument('--max-latency-us', type=float,
+                        help="Per-line inference budget in microseconds; enables the model search.")
+    parser.add_argument('--max-size-kb', type=float,
+                        help="Model size budget on disk in KB; enables the model search.")
+    args = parser.parse_args()
+    train_and_save_model(max_latency_us=args.max_latency_us, max_size_kb=args.max_size_kb)
\ No newline at end of file
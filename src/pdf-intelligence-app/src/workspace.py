@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import time
+
+# All request and job workspaces live under this directory.
+WORKSPACE_ROOT = os.environ.get('WORKSPACE_ROOT', os.path.join(tempfile.gettempdir(), 'pdf-intelligence'))
+_PREFIX = 'ws-'
+
+
+class Workspace:
+    """
+    A private scratch directory for one request or job. Nothing else writes to
+    it, so concurrent requests uploading files with the same name cannot
+    overwrite or delete each other's files. Use it as a context manager, or
+    call cleanup() once the work that uses it has finished.
+    """
+
+    def __init__(self, root=WORKSPACE_ROOT):
+        os.makedirs(root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=_PREFIX, dir=root)
+
+    def cleanup(self):
+        """Removes the workspace and everything in it. Safe to call more than once."""
+        if self.path:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+
+def sweep_stale_workspaces(root=WORKSPACE_ROOT, max_age_seconds=24 * 3600):
+    """
+    Removes workspaces left behind by processes that died before cleaning up.
+    Returns the number of workspaces removed.
+    """
+    if not os.path.isdir(root):
+        return 0
+
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in os.scandir(root):
+        if entry.is_dir() and entry.name.startswith(_PREFIX) and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
@@ -0,0 +1,26 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+@pytest.fixture(autouse=True)
+def app_dir(monkeypatch):
+    """Runs every test from the app directory, where the model and input paths are relative to."""
+    monkeypatch.chdir(APP_DIR)
+
+
+@pytest.fixture(scope="session")
+def pipeline_models():
+    """Skips the test unless the spaCy pipeline and the sentence encoder can be loaded."""
+    if importlib.util.find_spec("en_core_web_sm") is None:
+        pytest.skip("the spaCy model en_core_web_sm is not installed")
+    from src.models import get_sentence_model
+    try:
+        get_sentence_model()
+    except Exception as e:
+        pytest.skip(f"the sentence encoder cannot be loaded: {e}")
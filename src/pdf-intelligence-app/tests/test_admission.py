@@ -0,0 +1,26 @@
+import io
+
+import pytest
+
+from src.admission import AdmissionRejected, estimate_work
+from src.ingest import read_uploads, close_uploads
+
+
+def test_unreadable_upload_is_refused_before_admission():
+    uploads = read_uploads([("broken.pdf", io.BytesIO(b"%PDF-1.7 this is not a PDF"))])
+    try:
+        with pytest.raises(AdmissionRejected) as rejected:
+            estimate_work(uploads)
+    finally:
+        close_uploads(uploads)
+    assert rejected.value.status == 422
+    assert "broken.pdf" in str(rejected.value)
+
+
+def test_readable_upload_is_counted():
+    with open("input/STEMPathwaysFlyer.pdf", "rb") as f:
+        uploads = read_uploads([("flyer.pdf", io.BytesIO(f.read()))])
+    try:
+        assert estimate_work(uploads).pages > 0
+    finally:
+        close_uploads(uploads)
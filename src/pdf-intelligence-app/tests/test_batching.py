@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from src.batching import MicroBatcher
+
+
+def run_concurrently(batcher, calls):
+    results = [None] * len(calls)
+
+    def client(i):
+        try:
+            results[i] = batcher.submit(calls[i])
+        except BaseException as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(len(calls))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+        assert not t.is_alive(), "a caller is still waiting"
+    return results
+
+
+def test_each_caller_gets_its_own_slice():
+    batcher = MicroBatcher(lambda items: [x * 2 for x in items], "double", max_batch_size=64, max_wait_ms=20)
+    calls = [[i, i + 100] for i in range(16)]
+    assert run_concurrently(batcher, calls) == [[2 * i, 2 * i + 200] for i in range(16)]
+    assert batcher.stats()["calls"] == 16
+
+
+def dies_on_zero(items):
+    if 0 in items:
+        raise SystemExit("worker stopped")
+    return list(items)
+
+
+@pytest.fixture
+def worker_exits(monkeypatch):
+    """Records the exceptions that end worker threads, instead of pytest reporting them as unhandled."""
+    exits = []
+    monkeypatch.setattr(threading, "excepthook", lambda args: exits.append(args.exc_type))
+    return exits
+
+
+def test_worker_dying_fails_its_callers_and_is_replaced(worker_exits):
+    batcher = MicroBatcher(dies_on_zero, "dies", max_batch_size=64, max_wait_ms=20)
+    results = run_concurrently(batcher, [[0], [1], [2]])
+    assert any(isinstance(r, SystemExit) for r in results)
+    assert all(isinstance(r, SystemExit) or r == [i] for i, r in enumerate(results))
+    # A new worker serves later calls.
+    assert batcher.submit([3]) == [3]
+    assert worker_exits == [SystemExit]
+
+
+def test_call_carried_past_a_dying_worker_is_served(worker_exits):
+    # [1, 2] does not fit beside [0], so it is held for the next batch when
+    # the worker dies running [0].
+    batcher = MicroBatcher(dies_on_zero, "carry", max_batch_size=2, max_wait_ms=200)
+    results = [None, None]
+
+    def client(i, items):
+        try:
+            results[i] = batcher.submit(items)
+        except BaseException as e:
+            results[i] = e
+
+    first = threading.Thread(target=client, args=(0, [0]), daemon=True)
+    first.start()
+    time.sleep(0.05)
+    second = threading.Thread(target=client, args=(1, [1, 2]), daemon=True)
+    second.start()
+    for t in (first, second):
+        t.join(10)
+        assert not t.is_alive(), "a caller is still waiting"
+    assert isinstance(results[0], SystemExit)
+    assert results[1] == [1, 2]
+
+
+def test_errors_reach_the_caller():
+    def infer(items):
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        MicroBatcher(infer, "fails", max_batch_size=8).submit([1])
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from src.job_queue import JobQueue, QueueFull
+
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_cancelled_queued_job_frees_its_place_at_once():
+    jobs = JobQueue(num_workers=1, max_depth=2)
+    gate = threading.Event()
+    blocker = jobs.submit(lambda progress: gate.wait(5))
+    wait_for(lambda: blocker.status == "running")
+
+    first = jobs.submit(lambda progress: 1)
+    second = jobs.submit(lambda progress: 2)
+    with pytest.raises(QueueFull):
+        jobs.submit(lambda progress: 3)
+
+    jobs.cancel(first.id)
+    assert first.status == "cancelled"
+    assert jobs.depth == 1
+    third = jobs.submit(lambda progress: 3)
+    assert jobs.depth == 2
+
+    gate.set()
+    wait_for(lambda: second.finished and third.finished)
+    assert (second.result, third.result) == (2, 3)
+    assert jobs.depth == 0
+
+
+def test_slow_cleanup_does_not_block_the_queue():
+    jobs = JobQueue(num_workers=1, max_depth=4)
+    in_cleanup, release = threading.Event(), threading.Event()
+
+    def cleanup():
+        in_cleanup.set()
+        release.wait(5)
+
+    job = jobs.submit(lambda progress: 1, cleanup=cleanup)
+    assert in_cleanup.wait(5)
+    # The worker is inside cleanup; the queue still answers at once.
+    start = time.monotonic()
+    assert jobs.get(job.id).status == "completed"
+    queued = jobs.submit(lambda progress: 2)
+    jobs.cancel(queued.id)
+    assert time.monotonic() - start < 1
+    release.set()
@@ -0,0 +1,19 @@
+import os
+
+BUNDLED_PDFS = ["Dinner Ideas - Sides_1.pdf", "Dinner Ideas - Sides_2.pdf",
+                "E0CCG5S239.pdf", "STEMPathwaysFlyer.pdf"]
+
+
+def test_pipelined_output_matches_sequential(pipeline_models):
+    from src.main import run_analysis_pipeline
+    paths = [os.path.join("input", name) for name in BUNDLED_PDFS]
+    persona = "Food Contractor"
+    job = "Prepare a vegetarian buffet-style dinner menu for a corporate gathering."
+
+    results = [run_analysis_pipeline(paths, persona, job, use_cache=False, pipelined=pipelined,
+                                     deadline_seconds=0)
+               for pipelined in (False, True)]
+    for result in results:
+        del result["metadata"]["processing_timestamp"]
+    sequential, pipelined = results
+    assert pipelined == sequential
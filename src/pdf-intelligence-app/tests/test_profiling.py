@@ -0,0 +1,14 @@
+import pytest
+
+from src.profiling import Profiler, ProfilerBusy, profiling
+
+
+def test_second_concurrent_profile_is_rejected():
+    first = Profiler()
+    with profiling(first):
+        with pytest.raises(ProfilerBusy):
+            Profiler().start()
+    # Once the first run has stopped, a new one can start.
+    with profiling(Profiler()) as second:
+        pass
+    assert second.report()["total"]["wall_seconds"] >= 0
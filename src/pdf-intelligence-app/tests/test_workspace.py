@@ -0,0 +1,71 @@
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.ingest import read_uploads, close_uploads
+from src.workspace import Workspace
+
+BUNDLED_PDFS = ["Dinner Ideas - Sides_1.pdf", "Dinner Ideas - Sides_2.pdf",
+                "E0CCG5S239.pdf", "STEMPathwaysFlyer.pdf"]
+
+
+def test_spilled_uploads_with_the_same_name_stay_apart(tmp_path):
+    errors = []
+
+    def client(client_id):
+        for round_id in range(20):
+            payload = f"{client_id}:{round_id}:".encode() * 2048
+            workspace = Workspace(root=str(tmp_path))
+            uploads = []
+            try:
+                uploads = read_uploads([("Lunch Ideas.pdf", io.BytesIO(payload))],
+                                       spill_threshold=1024, spill_dir=workspace.path)
+                if uploads[0].read_bytes() != payload:
+                    errors.append((client_id, round_id))
+            finally:
+                close_uploads(uploads)
+                workspace.cleanup()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_concurrent_analyze_requests_with_same_name_uploads(pipeline_models, tmp_path):
+    # Every request uploads a different PDF under the same name, spilled into
+    # its workspace; each must get the analysis of its own PDF.
+    from app import create_app
+    app = create_app({"UPLOAD_SPILL_THRESHOLD": 0, "WORKSPACE_ROOT": str(tmp_path),
+                      "ADMISSION_MAX_WAITING": 64, "ADMISSION_MAX_WAIT_SECONDS": 600})
+    contents = {}
+    for name in BUNDLED_PDFS:
+        with open(os.path.join("input", name), "rb") as f:
+            contents[name] = f.read()
+
+    def analyze(name):
+        response = app.test_client().post("/analyze", data={
+            "persona": "Food Contractor",
+            "job": "Prepare a vegetarian buffet-style dinner menu for a corporate gathering.",
+            "no_cache": "1",
+            "files": (io.BytesIO(contents[name]), "same.pdf"),
+        }, content_type="multipart/form-data")
+        assert response.status_code == 200, response.get_data(as_text=True)
+        result = response.get_json()
+        result["metadata"].pop("processing_timestamp")
+        return json.dumps(result, sort_keys=True)
+
+    expected = {name: analyze(name) for name in BUNDLED_PDFS}
+    assert len(set(expected.values())) == len(BUNDLED_PDFS)
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [(name, pool.submit(analyze, name)) for name in BUNDLED_PDFS * 4]
+        for name, future in futures:
+            assert future.result() == expected[name]
+    assert os.listdir(tmp_path) == []
@@ -4,15 +4,30 @@ import joblib
 import os
 import numpy as np
 
+# Loaded classifiers, kept for the life of the process (e.g. the daemon in src/daemon.py).
+_models = {}
+
+def load_model(model_path):
+    """
+    Loads a heading classifier, reusing the copy already loaded from the same
+    file unless the file has changed since. Raises FileNotFoundError.
+    """
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _models:
+        _models[key] = joblib.load(model_path)
+    return _models[key]
+
 class PDFExtractor:
     """
     Extracts the title and a hierarchical list of headings from a PDF file
     using a pre-trained machine learning model to classify text lines.
     """
 
-    def __init__(self, pdf_path, model_path='src/heading_classifier.joblib'):
+    def __init__(self, pdf_path, model_path='src/heading_classifier.joblib', model=None):
         """
         Initializes the extractor, opens the PDF, and loads the trained model.
+        Pass an already loaded `model` to share it across many extractors.
         """
         self.pdf_path = pdf_path
         self.doc = None
@@ -25,14 +40,30 @@ class PDFExtractor:
             print(f"Error: The file '{pdf_path}' was not found.")
             return
 
+        if model is not None:
+            self.model = model
+            return
+
         # Load the pre-trained classifier model
         try:
-            self.model = joblib.load(model_path)
+            self.model = load_model(model_path)
         except FileNotFoundError:
             print(f"Error: Model file not found at '{model_path}'.")
             print("Please run the training script to create the model file.")
             return
 
+    def close(self):
+        """Closes the PDF. Safe to call more than once."""
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def _extract_features(self, page, line):
         """
         Extracts numerical features from a line of text for the model to use.
@@ -1,5 +1,76 @@
+import heapq
 import re
-from collections import Counter
+from collections import Counter, OrderedDict
+
+# Phrases that mark a heading as generally useful; each one present adds 5 points.
+BOOST_TERMS = [
+    'breakfast', 'lunch', 'dinner', 'ideas', 'mains', 'sides', 'recipe', 
+    'meals', 'healthy', 'family', 'plan', 'guide', 'things to do', 'tips', 
+    'tricks', 'how to', 'adventures', 'restaurants', 'hotels', 'cities', 
+    'cuisine', 'coastal', 'packing', 'features', 'creating', 'editing', 'sharing'
+]
+BOOST_SCORE = 5
+# Heading scores remembered per analyzer; the least recently used are dropped first.
+SCORE_CACHE_SIZE = 65536
+
+
+def _trie_regex(terms):
+    """
+    Builds a regex that matches any of `terms`, factored by common prefix
+    (e.g. 're(?:cipe|staurants)'), so each position is tested character by
+    character instead of term by term. Optional tails are greedy, so the
+    longest term starting at a position wins.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+def _compile_terms(terms):
+    """
+    Compiles substring terms into one matcher. Searching from each match's
+    start + 1 finds overlapping terms too, and each match is the longest term
+    starting there. Any shorter term that also starts there is a prefix of that
+    match, so `prefixes` maps each term to all terms it begins with, giving
+    every term present in one left-to-right scan.
+    """
+    terms = set(terms)
+    pattern = re.compile(_trie_regex(terms))
+    prefixes = {t: frozenset(p for p in terms if t.startswith(p)) for t in terms}
+    return pattern, prefixes
+
+
+_BOOST_PATTERN, _BOOST_PREFIXES = _compile_terms(BOOST_TERMS)
+
+
+def reference_score(keywords, text):
+    """
+    Scores a heading with the original per-term scan. Kept as the reference
+    that PersonaAnalyzer.score_heading must agree with, and as the baseline of
+    the benchmark below.
+    """
+    score = 1
+    heading_text_lower = text.lower()
+    for word in re.findall(r'\w+', heading_text_lower):
+        if word in keywords:
+            score += keywords[word]
+    for term in BOOST_TERMS:
+        if term in heading_text_lower:
+            score += BOOST_SCORE
+    return score
+
 
 class PersonaAnalyzer:
     """
@@ -7,14 +78,28 @@ class PersonaAnalyzer:
     relevant to a given persona and their job-to-be-done.
     """
 
-    def __init__(self, persona, job_to_be_done):
-        """Initializes the analyzer with the persona and job context."""
+    def __init__(self, persona, job_to_be_done, top_k=None, cache_size=SCORE_CACHE_SIZE):
+        """
+        Initializes the analyzer with the persona and job context. With `top_k`,
+        only the top_k highest ranked sections are returned. The scores of up
+        to `cache_size` distinct heading texts are memoized.
+        """
         if not persona or not job_to_be_done:
             raise ValueError("Persona and job_to_be_done cannot be empty.")
             
         self.persona = persona
         self.job_to_be_done = job_to_be_done
+        self.top_k = top_k
+        # Number of headings scored by the last analyze_documents call, before the top_k cap.
+        self.total_sections = 0
         self.keywords = self._extract_keywords()
+        # Keywords are whole words, so one alternation bounded by non-word
+        # characters matches exactly the tokens that are keywords.
+        self._keyword_pattern = None
+        if self.keywords:
+            self._keyword_pattern = re.compile(r'(?<!\w)' + _trie_regex(self.keywords) + r'(?!\w)')
+        self.cache_size = max(1, cache_size)
+        self._score_cache = OrderedDict()
 
     def _extract_keywords(self):
         """
@@ -45,50 +130,75 @@ class PersonaAnalyzer:
         
         return keywords
 
+    def score_heading(self, text):
+        """
+        Scores one heading: 1, plus the weight of each keyword token, plus
+        BOOST_SCORE for each boost term it contains. Scores are memoized by text.
+        """
+        score = self._score_cache.get(text)
+        if score is not None:
+            self._score_cache.move_to_end(text)
+            return score
+
+        # Start with a base score of 1 for every heading.
+        score = 1
+        heading_text_lower = text.lower()
+
+        # Score based on keyword matches in the heading text
+        if self._keyword_pattern is not None:
+            for word in self._keyword_pattern.findall(heading_text_lower):
+                score += self.keywords[word]
+
+        # Boost score for a wider range of relevant terms
+        match = _BOOST_PATTERN.search(heading_text_lower)
+        if match:
+            found = set()
+            while match:
+                found |= _BOOST_PREFIXES[match.group()]
+                match = _BOOST_PATTERN.search(heading_text_lower, match.start() + 1)
+            score += BOOST_SCORE * len(found)
+
+        self._score_cache[text] = score
+        if len(self._score_cache) > self.cache_size:
+            self._score_cache.popitem(last=False)
+        return score
+
+    @property
+    def cached_scores(self):
+        """Number of heading scores currently memoized; at most `cache_size`."""
+        return len(self._score_cache)
+
+    def score_headings(self, texts):
+        """Scores a batch of heading texts; see score_heading."""
+        return [self.score_heading(text) for text in texts]
+
     def analyze_documents(self, document_outlines):
         """
         Analyzes a collection of structured outlines to find and rank relevant sections.
         """
         scored_sections = []
 
-        for doc in document_outlines:
-            if 'outline' not in doc or not doc['outline']:
-                continue
-
-            for heading in doc['outline']:
-                # Start with a base score of 1 for every heading.
-                score = 1
-                heading_text_lower = heading['text'].lower()
-                heading_words = re.findall(r'\w+', heading_text_lower)
-                
-                # Score based on keyword matches in the heading text
-                for word in heading_words:
-                    if word in self.keywords:
-                        score += self.keywords[word]
-                
-                # Boost score for a wider range of relevant terms
-                boost_terms = [
-                    'breakfast', 'lunch', 'dinner', 'ideas', 'mains', 'sides', 'recipe', 
-                    'meals', 'healthy', 'family', 'plan', 'guide', 'things to do', 'tips', 
-                    'tricks', 'how to', 'adventures', 'restaurants', 'hotels', 'cities', 
-                    'cuisine', 'coastal', 'packing', 'features', 'creating', 'editing', 'sharing'
-                ]
-                for term in boost_terms:
-                    if term in heading_text_lower:
-                        score += 5
-
-                # **IMPROVEMENT**: We will now always add the section to be ranked.
-                # The sorting later will handle prioritizing the best ones.
-                scored_sections.append({
-                    "document": doc.get('source_file', 'Unknown'),
-                    "page_number": heading['page'],
-                    "section_title": heading['text'],
-                    "relevance_score": score,
-                    "refined_text": heading.get('subsection_text', '')
-                })
+        headings = [(doc, heading) for doc in document_outlines if doc.get('outline')
+                    for heading in doc['outline']]
+        scores = self.score_headings([heading['text'] for _, heading in headings])
 
-        # Sort by relevance score
-        ranked_sections = sorted(scored_sections, key=lambda x: x['relevance_score'], reverse=True)
+        for (doc, heading), score in zip(headings, scores):
+            # **IMPROVEMENT**: We will now always add the section to be ranked.
+            # The sorting later will handle prioritizing the best ones.
+            scored_sections.append({
+                "document": doc.get('source_file', 'Unknown'),
+                "page_number": heading['page'],
+                "section_title": heading['text'],
+                "relevance_score": score,
+                "refined_text": heading.get('subsection_text', '')
+            })
+
+        # Sort by relevance score; with a cap, only the top_k are selected (same order as a full sort)
+        self.total_sections = len(scored_sections)
+        if self.top_k:
+            ranked_sections = heapq.nlargest(self.top_k, scored_sections, key=lambda x: x['relevance_score'])
+        else:
+            ranked_sections = sorted(scored_sections, key=lambda x: x['relevance_score'], reverse=True)
 
         # Prepare the final output lists
         extracted_sections_output = []
@@ -110,3 +220,46 @@ class PersonaAnalyzer:
                 })
 
         return extracted_sections_output, subsection_analysis_output
+
+
+if __name__ == "__main__":
+    # Benchmark: python src/persona_analyzer.py
+    # Times scoring 100k headings with the compiled matcher, the original
+    # per-term scan and the memo. tests/test_persona_analyzer.py checks that
+    # the two matchers give identical scores.
+    import random
+    import time
+
+    random.seed(42)
+    # Mostly ordinary heading words, with keywords and boost terms mixed in.
+    vocabulary = (['Introduction', 'Conclusion', 'Chapter', 'Section', 'Overview', 'Notes', 'Summary',
+                   'Background', 'Results', 'Appendix', 'Table', 'Figure', 'Part', 'Step', 'Policy',
+                   'Requirements', 'Schedule', 'Budget', 'Contact', 'References', '2024', 'II', 'A']
+                  * 4 + BOOST_TERMS + ['Vegetarian', 'buffet', 'gluten-free', 'Menu', 'Corporate',
+                                       'Gathering', 'Mediterranean', 'Salads', 'Dinners', 'Sideshow'])
+    headings = [" ".join(random.choice(vocabulary) for _ in range(random.randint(1, 8)))
+                for _ in range(100_000)]
+    # Glued words such as 'SidesHaring' exercise overlapping term matches.
+    headings[::10] = ["".join(random.choice(vocabulary) for _ in range(random.randint(2, 4)))
+                      for _ in range(len(headings[::10]))]
+
+    analyzer = PersonaAnalyzer("Food Contractor", "Prepare a vegetarian buffet-style dinner menu "
+                                                  "for a corporate gathering, including gluten-free items.",
+                               cache_size=len(headings))
+
+    start = time.perf_counter()
+    for h in headings:
+        reference_score(analyzer.keywords, h)
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analyzer.score_headings(headings)
+    compiled_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analyzer.score_headings(headings)
+    cached_seconds = time.perf_counter() - start
+
+    print(f"{len(headings)} headings: per-term scan {reference_seconds:.2f}s, "
+          f"compiled {compiled_seconds:.2f}s ({reference_seconds / compiled_seconds:.1f}x), "
+          f"memoized {cached_seconds:.3f}s.")
@@ -0,0 +1,87 @@
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Page sizes for the paginated sections API.
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Parsed result files kept in memory; the least recently used are dropped first.
+MAX_CACHED_RESULTS = int(os.environ.get('MAX_CACHED_RESULTS', 32))
+
+
+class InvalidCursor(Exception):
+    """Raised for a malformed cursor, or one issued for an older version of the result."""
+
+
+def encode_cursor(offset, version):
+    raw = json.dumps({"o": offset, "v": version}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, version):
+    """Returns the offset stored in `cursor`, checking it belongs to `version`."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        offset, cursor_version = int(data["o"]), data["v"]
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("The cursor is not valid.")
+    if cursor_version != version:
+        raise InvalidCursor("The result has changed since this cursor was issued; start again.")
+    return offset
+
+
+class ResultStore:
+    """
+    Serves the ranked sections of analysis result files page by page, so a
+    client never downloads a whole large result. Parsed results are kept in
+    memory, up to `max_results` of them, and re-read only when the file's
+    size or mtime changes.
+    """
+
+    def __init__(self, max_results=MAX_CACHED_RESULTS):
+        self.max_results = max(1, max_results)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """Returns (version, parsed result) for the result file at `path`."""
+        stat = os.stat(path)
+        version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(path)
+                return cached
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        with self._lock:
+            self._cache[path] = (version, result)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.max_results:
+                self._cache.popitem(last=False)
+        return version, result
+
+    def page(self, path, offset=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        Returns one page of the ranked sections, starting at `offset` or at the
+        position saved in `cursor`, with the result's metadata and the cursor of
+        the next page (None on the last page).
+        """
+        version, result = self.load(path)
+        sections = result.get("extracted_sections", []) if isinstance(result, dict) else []
+        if cursor:
+            offset = decode_cursor(cursor, version)
+        offset = max(0, offset or 0)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        end = offset + limit
+        return {
+            "metadata": result.get("metadata", {}) if isinstance(result, dict) else {},
+            "total": len(sections),
+            "offset": offset,
+            "limit": limit,
+            "sections": sections[offset:end],
+            "next_cursor": encode_cursor(end, version) if end < len(sections) else None,
+        }
@@ -0,0 +1,83 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF = os.path.join('input', 'E0CCG5S239.pdf')
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    socket_path = str(tmp_path / 'run' / 'daemon.sock')
+    process = subprocess.Popen([sys.executable, 'src/daemon.py', '--socket', socket_path], cwd=REPO,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(200):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("the daemon did not start")
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def run_main(socket_path, *args, cwd=REPO, env=None):
+    env = dict(os.environ, PDF_DAEMON_SOCKET=socket_path, **(env or {}))
+    return subprocess.run([sys.executable, os.path.join(REPO, 'src', 'main.py'), *args], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=120)
+
+
+@pytest.mark.parametrize("args", [[PDF], [PDF, '-o', 'outline.json'],
+                                  [PDF, '--persona', 'Food Contractor', '--job', 'Plan a buffet', '-o', 'analysis.json']])
+def test_daemon_output_matches_in_process_run(daemon, tmp_path, args):
+    # Each run writes into its own directory, so the two outputs can be compared.
+    args = [os.path.join(REPO, a) if a == PDF else a for a in args]
+    (tmp_path / 'daemon').mkdir()
+    (tmp_path / 'local').mkdir()
+    in_daemon = run_main(daemon, *args, cwd=tmp_path / 'daemon')
+    in_process = run_main(daemon, *args, '--no-daemon', cwd=tmp_path / 'local')
+
+    assert in_daemon.returncode == in_process.returncode == 0
+    assert in_daemon.stdout == in_process.stdout
+    assert sorted(os.listdir(tmp_path / 'daemon')) == sorted(os.listdir(tmp_path / 'local'))
+    for name in os.listdir(tmp_path / 'local'):
+        if name.endswith('.json'):
+            with open(tmp_path / 'daemon' / name) as a, open(tmp_path / 'local' / name) as b:
+                daemon_output, local_output = json.load(a), json.load(b)
+            for output in (daemon_output, local_output):
+                output.get("metadata", {}).pop("processing_timestamp", None)
+            assert daemon_output == local_output
+
+
+def test_daemon_exit_status_matches_in_process_run(daemon, tmp_path):
+    # A usage error exits with argparse's status, as it would in-process.
+    usage_daemon = run_main(daemon, cwd=tmp_path)
+    usage_local = run_main(daemon, '--no-daemon', cwd=tmp_path)
+    assert usage_daemon.returncode == usage_local.returncode == 2
+    assert usage_daemon.stderr == usage_local.stderr
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid') or os.getuid() != 0, reason="needs root to chown the socket")
+def test_socket_of_another_user_is_ignored(tmp_path):
+    sys.path.insert(0, os.path.join(REPO, 'src'))
+    from daemon import run_in_daemon
+
+    socket_path = str(tmp_path / 'foreign.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+    os.chown(socket_path, 12345, 12345)
+    try:
+        assert run_in_daemon([PDF], 'src/main.py', socket_path) is None
+    finally:
+        server.close()
@@ -0,0 +1,40 @@
+import json
+import os
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, 'src'))
+
+from indexer import index_directory  # noqa: E402
+
+MODEL = os.path.join(REPO, 'src', 'heading_classifier.joblib')
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failed_files_are_retried(tmp_path):
+    pdfs = tmp_path / 'pdfs'
+    pdfs.mkdir()
+    (pdfs / 'broken.pdf').write_bytes(b'not a pdf')
+    output = str(tmp_path / 'outlines.jsonl')
+
+    first = index_directory(str(pdfs), output, model_path=MODEL)
+    second = index_directory(str(pdfs), output, model_path=MODEL)
+
+    assert first["errors"] == second["errors"] == 1
+    assert second["unchanged"] == 0
+    assert [r["source_file"] for r in read_jsonl(output)] == ['broken.pdf', 'broken.pdf']
+
+
+def test_missing_model_indexes_nothing(tmp_path, capsys):
+    pdfs = tmp_path / 'pdfs'
+    pdfs.mkdir()
+    (pdfs / 'a.pdf').write_bytes(b'not a pdf')
+    output = tmp_path / 'outlines.jsonl'
+
+    assert index_directory(str(pdfs), str(output), model_path=str(tmp_path / 'missing.joblib')) is None
+    assert "Could not load the heading classifier" in capsys.readouterr().out
+    assert not output.exists()
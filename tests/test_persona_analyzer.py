@@ -0,0 +1,38 @@
+import os
+import random
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, 'src'))
+
+from persona_analyzer import PersonaAnalyzer, BOOST_TERMS, reference_score  # noqa: E402
+
+
+def make_analyzer(**kwargs):
+    return PersonaAnalyzer("Food Contractor", "Prepare a vegetarian buffet-style dinner menu "
+                                              "for a corporate gathering, including gluten-free items.", **kwargs)
+
+
+def test_compiled_matcher_scores_like_the_per_term_scan():
+    rng = random.Random(42)
+    vocabulary = (['Introduction', 'Chapter', 'Overview', 'Notes', 'Results', 'Table', '2024', 'II', 'A']
+                  * 4 + BOOST_TERMS + ['Vegetarian', 'buffet', 'gluten-free', 'Menu', 'Corporate',
+                                       'Gathering', 'Mediterranean', 'Salads', 'Dinners', 'Sideshow'])
+    headings = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 8))) for _ in range(5000)]
+    # Glued words such as 'SidesHaring' exercise overlapping term matches.
+    headings += ["".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 4))) for _ in range(1000)]
+
+    analyzer = make_analyzer()
+    expected = [reference_score(analyzer.keywords, h) for h in headings]
+    assert analyzer.score_headings(headings) == expected
+    # Memoized scores are the same.
+    assert analyzer.score_headings(headings) == expected
+
+
+def test_score_cache_is_bounded():
+    analyzer = make_analyzer(cache_size=3)
+    texts = ["Dinner ideas", "Sides", "Notes", "Dinner ideas", "Packing tips", "Things to do"]
+    scores = analyzer.score_headings(texts)
+    assert analyzer.cached_scores == 3
+    # Scores dropped from the memo are recomputed the same.
+    assert analyzer.score_headings(texts) == scores == [reference_score(analyzer.keywords, t) for t in texts]
@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, 'src'))
+
+from results import ResultStore  # noqa: E402
+
+
+def write_result(path, sections):
+    path.write_text(json.dumps({"metadata": {}, "extracted_sections": sections}), encoding='utf-8')
+    return str(path)
+
+
+def rewrite_in_place(path, sections):
+    """Changes a result file's content but keeps its size and mtime, so only a re-read notices."""
+    stat = os.stat(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"metadata": {}, "extracted_sections": sections}))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_least_recently_used_result_is_evicted(tmp_path):
+    store = ResultStore(max_results=2)
+    a, b, c = (write_result(tmp_path / f"{name}.json", [name]) for name in "abc")
+    for path in (a, b, a, c):
+        store.load(path)
+    for path in (a, b, c):
+        rewrite_in_place(path, [os.path.basename(path)[0].upper()])
+
+    # a and c were used most recently and are served from memory; b was evicted and is read again.
+    assert store.page(a)["sections"] == ["a"]
+    assert store.page(c)["sections"] == ["c"]
+    assert store.page(b)["sections"] == ["B"]